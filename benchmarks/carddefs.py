@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+Synthesize a CardDefs.xml with a card distribution close to the real one.
+
+Usage: python -m benchmarks.carddefs 12500 CardDefs.xml [--seed N]
+"""
+import random
+import sys
+from argparse import ArgumentParser
+
+from hearthstone.cardxml import CardXML
+from hearthstone.enums import (
+	CardClass, CardSet, CardType, Faction, GameTag, Locale, PlayReq, Race, Rarity
+)
+from hearthstone.utils import SCHEME_CARDS, SPELLSTONE_STRINGS, ElementTree
+
+
+# Roughly the number of entities in CardDefs.xml at the time of writing
+BASE_CARD_COUNT = 12500
+
+LOCALES = sorted(locale.name for locale in Locale if not locale.unused)
+
+CARD_TYPES = [
+	(CardType.ENCHANTMENT, 36),
+	(CardType.MINION, 31),
+	(CardType.SPELL, 19),
+	(CardType.HERO_POWER, 8),
+	(CardType.HERO, 3),
+	(CardType.WEAPON, 3),
+]
+
+CARD_CLASSES = [(CardClass.NEUTRAL, 40)] + [
+	(card_class, 6) for card_class in CardClass if card_class.is_playable
+]
+
+CARD_SETS = [
+	CardSet.CORE, CardSet.EXPERT1, CardSet.NAXX, CardSet.GVG, CardSet.BRM, CardSet.TGT,
+	CardSet.LOE, CardSet.OG, CardSet.KARA, CardSet.GANGS, CardSet.UNGORO, CardSet.ICECROWN,
+	CardSet.LOOTAPALOOZA, CardSet.GILNEAS, CardSet.BOOMSDAY, CardSet.TROLL, CardSet.DALARAN,
+]
+
+RARITIES = [
+	(Rarity.COMMON, 40),
+	(Rarity.RARE, 25),
+	(Rarity.EPIC, 17),
+	(Rarity.LEGENDARY, 13),
+	(Rarity.FREE, 5),
+]
+
+# (tag, probability) for mechanics set on playable cards
+MECHANICS = [
+	(GameTag.BATTLECRY, 0.2),
+	(GameTag.DEATHRATTLE, 0.1),
+	(GameTag.TAUNT, 0.1),
+	(GameTag.DISCOVER, 0.05),
+	(GameTag.DIVINE_SHIELD, 0.04),
+	(GameTag.CHARGE, 0.03),
+	(GameTag.RUSH, 0.03),
+	(GameTag.LIFESTEAL, 0.03),
+	(GameTag.POISONOUS, 0.02),
+	(GameTag.SECRET, 0.02),
+	(GameTag.TRIGGER_VISUAL, 0.15),
+	(GameTag.AURA, 0.03),
+]
+
+TEXTS = [
+	"<b>Battlecry:</b> Deal $%i damage.",
+	"<b>Taunt</b>\nAfter you cast a spell, gain +%i Attack.",
+	"<b>Deathrattle:</b> Summon a %i/%i copy of this minion.",
+	"Draw %i cards. If you're holding a Dragon, gain 2 Armor.",
+	"[x]At the end of your turn,\ngive a random friendly\nminion +%i/+%i.",
+	"<b>Discover</b> a spell. It costs (%i) less.",
+]
+
+# Share of texts with a trailing collection-only text ("text@collection text")
+COLLECTION_TEXT_RATE = 0.03
+
+
+def weighted_choice(rnd, choices):
+	values, weights = zip(*choices)
+	return rnd.choices(values, weights)[0]
+
+
+def localize(text, locale):
+	if locale == "enUS":
+		return text
+	# Non-ASCII content makes sure encoding is exercised
+	return "%s (%s, «é»)" % (text, locale)
+
+
+def make_text(rnd, card_id):
+	text = rnd.choice(TEXTS).replace("%i", str(rnd.randint(1, 10)))
+	if card_id in SPELLSTONE_STRINGS or card_id in SCHEME_CARDS:
+		return text + " @"
+	if rnd.random() < COLLECTION_TEXT_RATE:
+		return text + "@" + text.split(".")[0] + "."
+	return text
+
+
+def make_card(rnd, index):
+	# The first cards reuse the ids with special "@" handling
+	special_ids = list(SPELLSTONE_STRINGS) + list(SCHEME_CARDS)
+	if index < len(special_ids):
+		card_id = special_ids[index]
+	else:
+		card_id = "BMK_%06i" % (index)
+
+	card = CardXML(card_id)
+	card.dbf_id = 100000 + index
+	card_type = weighted_choice(rnd, CARD_TYPES)
+	playable = card_type in (CardType.MINION, CardType.SPELL, CardType.WEAPON, CardType.HERO)
+	card.tags[GameTag.CARDTYPE] = int(card_type)
+	card.tags[GameTag.CLASS] = int(weighted_choice(rnd, CARD_CLASSES))
+	card.tags[GameTag.CARD_SET] = int(rnd.choice(CARD_SETS))
+
+	if card_type != CardType.ENCHANTMENT:
+		card.tags[GameTag.COST] = rnd.randint(0, 10)
+	if card_type in (CardType.MINION, CardType.WEAPON):
+		card.tags[GameTag.ATK] = rnd.randint(0, 12)
+	if card_type == CardType.MINION:
+		card.tags[GameTag.HEALTH] = rnd.randint(1, 12)
+		if rnd.random() < 0.25:
+			card.tags[GameTag.CARDRACE] = int(rnd.choice([r for r in Race if r]))
+		if rnd.random() < 0.05:
+			card.tags[GameTag.FACTION] = int(rnd.choice([Faction.ALLIANCE, Faction.HORDE]))
+	elif card_type == CardType.WEAPON:
+		card.tags[GameTag.DURABILITY] = rnd.randint(1, 8)
+	elif card_type == CardType.HERO:
+		card.tags[GameTag.ARMOR] = 5
+
+	if playable:
+		card.tags[GameTag.RARITY] = int(weighted_choice(rnd, RARITIES))
+		if rnd.random() < 0.25:
+			card.tags[GameTag.COLLECTIBLE] = 1
+		for tag, probability in MECHANICS:
+			if rnd.random() < probability:
+				card.tags[tag] = 1
+		if rnd.random() < 0.1:
+			card.referenced_tags[rnd.choice(MECHANICS)[0]] = 1
+		if rnd.random() < 0.3:
+			card.powers.append({
+				"definition": "%08x-0000-0000-0000-000000000000" % (index),
+				"requirements": {PlayReq.REQ_TARGET_TO_PLAY: 0, PlayReq.REQ_MINION_TARGET: 0},
+			})
+		if rnd.random() < 0.02:
+			card.entourage = ["BMK_%06i" % (rnd.randrange(index + 1)) for i in range(3)]
+
+	collectible = card.tags.get(GameTag.COLLECTIBLE, 0)
+	name = "Card %i" % (index)
+	text = make_text(rnd, card_id) if rnd.random() < 0.75 else ""
+	flavor = "Flavor text for card %i." % (index) if collectible else ""
+	for locale in LOCALES:
+		card.strings[GameTag.CARDNAME][locale] = localize(name, locale)
+		if text:
+			card.strings[GameTag.CARDTEXT_INHAND][locale] = localize(text, locale)
+		if flavor:
+			card.strings[GameTag.FLAVORTEXT][locale] = localize(flavor, locale)
+
+	if collectible:
+		card.strings[GameTag.ARTISTNAME] = "Artist %i" % (rnd.randrange(200))
+	if playable and rnd.random() < 0.1:
+		for locale in LOCALES:
+			card.strings[GameTag.TARGETING_ARROW_TEXT][locale] = localize("Choose a target.", locale)
+
+	return card
+
+
+def write_carddefs(filename, count, seed=0, build=1):
+	rnd = random.Random(seed)
+	with open(filename, "w", encoding="utf-8") as f:
+		f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+		f.write('<CardDefs build="%i">\n' % (build))
+		for i in range(count):
+			f.write(ElementTree.tostring(make_card(rnd, i).to_xml(), encoding="unicode"))
+			f.write("\n")
+		f.write("</CardDefs>\n")
+
+
+def main():
+	p = ArgumentParser()
+	p.add_argument("count", type=int, help="Number of entities to write")
+	p.add_argument("output", help="Path to the CardDefs.xml to write")
+	p.add_argument("--seed", type=int, default=0)
+	args = p.parse_args(sys.argv[1:])
+
+	print("Writing %i cards to %r" % (args.count, args.output))
+	write_carddefs(args.output, args.count, args.seed)
+
+
+if __name__ == "__main__":
+	main()
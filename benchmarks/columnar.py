@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Compare the columnar cards format with cards.json: file size and parse time.
+
+Usage: python -m benchmarks.columnar path/to/cards.json [-o results.json]
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from columnar import ColumnarCards, ColumnarWriter
+from generate_hearthstonejson import ENUM_FIELDS
+
+
+def best_of(func, repeat):
+	timings = []
+	for i in range(repeat):
+		start = time.perf_counter()
+		func()
+		timings.append(time.perf_counter() - start)
+	return min(timings)
+
+
+def main():
+	p = ArgumentParser()
+	p.add_argument("cards_json", help="A cards.json file written by generate_hearthstonejson.py")
+	p.add_argument("-o", "--output", help="Write the results as JSON to this file")
+	p.add_argument("--repeat", type=int, default=5)
+	args = p.parse_args(sys.argv[1:])
+
+	with open(args.cards_json, "rb") as f:
+		json_data = f.read()
+	cards = json.loads(json_data.decode("utf-8"))
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		filename = os.path.join(tmpdir, "cards.columnar")
+		writer = ColumnarWriter(filename, ENUM_FIELDS)
+		for card in cards:
+			writer.add(card)
+		writer.close()
+
+		with open(filename, "rb") as f:
+			columnar_data = f.read()
+
+		def load_json():
+			with open(args.cards_json, "rb") as f:
+				json.loads(f.read().decode("utf-8"))
+
+		def open_columnar():
+			ColumnarCards(filename).close()
+
+		def read_column():
+			with ColumnarCards(filename) as columnar:
+				columnar.column("cardClass")
+
+		def read_card():
+			with ColumnarCards(filename) as columnar:
+				columnar[len(columnar) // 2]
+
+		def read_all():
+			with ColumnarCards(filename) as columnar:
+				list(columnar)
+
+		with ColumnarCards(filename) as columnar:
+			assert list(columnar) == cards
+
+		results = {
+			"cards": len(cards),
+			"size": {
+				"json": len(json_data),
+				"json_gz": len(gzip.compress(json_data)),
+				"columnar": len(columnar_data),
+				"columnar_gz": len(gzip.compress(columnar_data)),
+			},
+			"seconds": {
+				"json_load": best_of(load_json, args.repeat),
+				"columnar_open": best_of(open_columnar, args.repeat),
+				"columnar_one_column": best_of(read_column, args.repeat),
+				"columnar_one_card": best_of(read_card, args.repeat),
+				"columnar_all_cards": best_of(read_all, args.repeat),
+			},
+		}
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent="\t", sort_keys=True)
+	json.dump(results, sys.stdout, indent="\t", sort_keys=True)
+	sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+	main()
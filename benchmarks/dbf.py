@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Compare dbfreader.iter_dbf_records with hearthstone.dbf.Dbf.load on a
+synthetic CARD_TAG.xml: time and peak memory.
+
+Usage: python -m benchmarks.dbf [--records 2000000] [-o results.json]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+from argparse import ArgumentParser
+
+from hearthstone.dbf import Dbf
+
+from dbfreader import iter_dbf_records
+
+from .utils import measure_in_fork
+
+
+CARD_TAG_COLUMNS = [
+	("ID", "Int"),
+	("CARD_ID", "Int"),
+	("TAG_ID", "Int"),
+	("TAG_VALUE", "Int"),
+	("IS_REFERENCE_TAG", "Bool"),
+	("IS_POWER_KEYWORD_TAG", "Bool"),
+]
+
+# Roughly 25 tags per card
+TAGS_PER_CARD = 25
+
+
+def write_card_tag_dbf(filename, count, seed=0):
+	rnd = random.Random(seed)
+	with open(filename, "w", encoding="utf-8") as f:
+		f.write('<?xml version="1.0" encoding="utf-8"?>\n<Dbf name="CARD_TAG">\n')
+		f.write("\t<SourceFingerprint>benchmark</SourceFingerprint>\n")
+		for name, type in CARD_TAG_COLUMNS:
+			f.write('\t<Column name="%s" type="%s" />\n' % (name, type))
+
+		for i in range(count):
+			values = (
+				i + 1,
+				i // TAGS_PER_CARD + 1,
+				rnd.randrange(2000),
+				rnd.randrange(100),
+				rnd.random() < 0.05,
+				rnd.random() < 0.1,
+			)
+			f.write("\t<Record>\n")
+			for (name, type), value in zip(CARD_TAG_COLUMNS, values):
+				f.write('\t\t<Field column="%s">%s</Field>\n' % (name, value))
+			f.write("\t</Record>\n")
+
+		f.write("</Dbf>\n")
+
+
+def read_dbf_load(path):
+	count = 0
+	for record in Dbf.load(path).records:
+		count += 1
+	return count
+
+
+def read_iter_dbf_records(path):
+	count = 0
+	for record in iter_dbf_records(path):
+		count += 1
+	return count
+
+
+READERS = {
+	"Dbf.load": read_dbf_load,
+	"iter_dbf_records": read_iter_dbf_records,
+}
+
+
+def main():
+	p = ArgumentParser()
+	p.add_argument("-o", "--output", help="Write the results as JSON to this file")
+	p.add_argument("--records", type=int, default=2000000)
+	p.add_argument("--seed", type=int, default=0)
+	p.add_argument("--tmpdir", help="Where to write the synthetic file (default: system temp)")
+	args = p.parse_args(sys.argv[1:])
+
+	with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+		path = os.path.join(tmpdir, "CARD_TAG.xml")
+		print("Writing %i records to %r" % (args.records, path))
+		write_card_tag_dbf(path, args.records, args.seed)
+
+		results = {"records": args.records, "xml_bytes": os.path.getsize(path), "readers": {}}
+		for name, func in READERS.items():
+			print("Running %r" % (name))
+			result = measure_in_fork(lambda: path, func)
+			assert result.pop("result") == args.records
+			result["records_per_second"] = args.records / result["seconds"]
+			results["readers"][name] = result
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent="\t", sort_keys=True)
+	json.dump(results, sys.stdout, indent="\t", sort_keys=True)
+	sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Benchmark generate_hearthstonejson.py on synthetic CardDefs.xml files.
+
+Each phase runs in a forked process so that its peak memory is measured on
+its own. Results are written as JSON for comparison between revisions.
+
+Usage: python -m benchmarks.hearthstonejson [--scales 1 10 100] [-o results.json]
+"""
+import json
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser
+
+from hearthstone.cardxml import load
+
+from generate_hearthstonejson import (
+	export_all_locales_cards_to_file, export_cards_to_file, load_cards, serialize_card
+)
+
+from .carddefs import BASE_CARD_COUNT, write_carddefs
+from .utils import measure_in_fork
+
+
+def phase_load(path, tmpdir):
+	db, xml = load(path)
+	return len(db)
+
+
+def phase_load_cards(path, tmpdir):
+	return len(load_cards(path))
+
+
+def phase_serialize_card(db, tmpdir):
+	for card in db.values():
+		serialize_card(card)
+	return len(db)
+
+
+def phase_export_cards_to_file(db, tmpdir):
+	export_cards_to_file(db.values(), os.path.join(tmpdir, "cards.json"), "enUS")
+	return len(db)
+
+
+def phase_export_all_locales_cards_to_file(db, tmpdir):
+	export_all_locales_cards_to_file(db.values(), os.path.join(tmpdir, "cards.all.json"))
+	return len(db)
+
+
+PHASES = {
+	"load": phase_load,
+	"load_cards": phase_load_cards,
+	"serialize_card": phase_serialize_card,
+	"export_cards_to_file": phase_export_cards_to_file,
+	"export_all_locales_cards_to_file": phase_export_all_locales_cards_to_file,
+}
+
+
+def run_phase(name, path, tmpdir):
+	if name in ("load", "load_cards"):
+		setup = lambda: path
+	else:
+		setup = lambda: load_cards(path)
+
+	try:
+		ret = measure_in_fork(setup, lambda arg: PHASES[name](arg, tmpdir))
+	except RuntimeError:
+		raise RuntimeError("Phase %r failed on %r" % (name, path))
+
+	ret["cards"] = ret.pop("result")
+	ret["cards_per_second"] = ret["cards"] / ret["seconds"] if ret["seconds"] else None
+	return ret
+
+
+def run_scale(scale, base_count, phases, tmpdir, seed):
+	count = base_count * scale
+	path = os.path.join(tmpdir, "CardDefs.%ix.xml" % (scale))
+	print("Writing %i cards to %r" % (count, path))
+	write_carddefs(path, count, seed)
+
+	ret = {"scale": scale, "cards": count, "xml_bytes": os.path.getsize(path), "phases": {}}
+	for name in phases:
+		print("Running %r at %ix" % (name, scale))
+		ret["phases"][name] = run_phase(name, path, tmpdir)
+		print("-> %.3fs, peak %i KiB" % (
+			ret["phases"][name]["seconds"], ret["phases"][name]["peak_rss_kb"]
+		))
+
+	os.remove(path)
+	return ret
+
+
+def main():
+	p = ArgumentParser()
+	p.add_argument("-o", "--output", help="Write the results as JSON to this file")
+	p.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+	p.add_argument("--base-count", type=int, default=BASE_CARD_COUNT)
+	p.add_argument("--phases", nargs="+", choices=list(PHASES), default=list(PHASES))
+	p.add_argument("--seed", type=int, default=0)
+	p.add_argument("--tmpdir", help="Where to write the synthetic files (default: system temp)")
+	args = p.parse_args(sys.argv[1:])
+
+	results = {"python": sys.version.split()[0], "base_count": args.base_count, "runs": []}
+	with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+		for scale in args.scales:
+			results["runs"].append(run_scale(scale, args.base_count, args.phases, tmpdir, args.seed))
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent="\t", sort_keys=True)
+	json.dump(results, sys.stdout, indent="\t", sort_keys=True)
+	sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Compare the deck tile implementations of cardtiles on synthetic portraits:
+the Pillow 2x tiled paste and crop, the NumPy crop one tile at a time, and
+generate_tile_images() on all tiles at once (which crops the tiles of a same
+portrait together). Checks that all three produce the same pixels.
+
+Most of the time of each is the final Lanczos resample, done by Pillow.
+
+Usage: python -m benchmarks.tiles [--portraits 500] [--cards-per-portrait 1] [-o results.json]
+"""
+import hashlib
+import json
+import random
+import sys
+from argparse import ArgumentParser
+
+import numpy as np
+from PIL import Image
+
+from cardtiles import (
+	DEFAULT_TILE_PROPS, TEX_DIM, generate_tile_image, generate_tile_image_pillow,
+	generate_tile_images
+)
+
+from .utils import measure_in_fork
+
+
+def make_portraits(count, cards_per_portrait=1, seed=0):
+	rnd = np.random.RandomState(seed)
+	ret = []
+	for i in range(count):
+		if i % cards_per_portrait == 0:
+			# Noise is unlike real art, but is cropped and resampled the same
+			pixels = rnd.randint(0, 256, (TEX_DIM, TEX_DIM, 4), dtype=np.uint8)
+			img = Image.fromarray(pixels, "RGBA")
+		ret.append(img)
+	return ret
+
+
+def make_tile_props(count, seed=0):
+	rnd = random.Random(seed)
+	ret = []
+	for i in range(count):
+		if rnd.random() < 0.5:
+			# Most cards have no tile material
+			ret.append(DEFAULT_TILE_PROPS)
+			continue
+		# Some wrap around the portrait's edge, some are mirrored
+		ret.append((
+			rnd.uniform(-1, 1), rnd.uniform(-0.5, 0.5),
+			rnd.choice((-1, 1)) * rnd.uniform(0.8, 1.2), rnd.uniform(0.8, 1.2),
+			rnd.uniform(-0.2, 0.2), rnd.uniform(-0.2, 0.2), rnd.uniform(0.8, 1.2),
+		))
+	return ret
+
+
+def hash_tiles(tiles):
+	ret = hashlib.sha1()
+	for tile in tiles:
+		ret.update(tile.tobytes())
+	return ret.hexdigest()
+
+
+def run_pillow(inputs):
+	portraits, props_list = inputs
+	return hash_tiles(generate_tile_image_pillow(img, props) for img, props in zip(portraits, props_list))
+
+
+def run_numpy(inputs):
+	portraits, props_list = inputs
+	return hash_tiles(generate_tile_image(img, props) for img, props in zip(portraits, props_list))
+
+
+def run_numpy_batch(inputs):
+	portraits, props_list = inputs
+	return hash_tiles(generate_tile_images(portraits, props_list))
+
+
+RUNNERS = {
+	"pillow": run_pillow,
+	"numpy": run_numpy,
+	"numpy_batch": run_numpy_batch,
+}
+
+
+def main():
+	p = ArgumentParser()
+	p.add_argument("-o", "--output", help="Write the results as JSON to this file")
+	p.add_argument("--portraits", type=int, default=500)
+	p.add_argument(
+		"--cards-per-portrait", type=int, default=1,
+		help="Tiles cropped from each portrait (with different tile props)"
+	)
+	p.add_argument("--seed", type=int, default=0)
+	args = p.parse_args(sys.argv[1:])
+
+	def setup():
+		portraits = make_portraits(args.portraits, args.cards_per_portrait, args.seed)
+		return portraits, make_tile_props(args.portraits, args.seed)
+
+	results = {
+		"portraits": args.portraits,
+		"cards_per_portrait": args.cards_per_portrait,
+		"runners": {},
+	}
+	hashes = set()
+	for name, func in RUNNERS.items():
+		print("Running %r" % (name))
+		result = measure_in_fork(setup, func)
+		hashes.add(result.pop("result"))
+		result["tiles_per_second"] = args.portraits / result["seconds"]
+		results["runners"][name] = result
+	results["pixel_identical"] = len(hashes) == 1
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent="\t", sort_keys=True)
+	json.dump(results, sys.stdout, indent="\t", sort_keys=True)
+	sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,56 @@
+"""
+Helpers shared by the benchmarks.
+"""
+import json
+import os
+import sys
+import time
+import traceback
+
+from phaseprofiler import get_peak_rss_kb, reset_peak_rss
+
+
+def measure_in_fork(setup, func):
+	"""
+	Call func(setup()) in a forked process, so that its peak memory is
+	measured on its own. func must return a JSON-serializable result.
+	Returns a dict of the result, wall and CPU time, and RSS before and at
+	the peak of the call (setup() is not measured).
+	"""
+	read_fd, write_fd = os.pipe()
+	sys.stdout.flush()
+	pid = os.fork()
+	if pid == 0:
+		os.close(read_fd)
+		status = 1
+		try:
+			arg = setup()
+			reset_peak_rss()
+			start_rss = get_peak_rss_kb()
+			start, start_cpu = time.perf_counter(), time.process_time()
+			result = func(arg)
+			ret = {
+				"result": result,
+				"seconds": time.perf_counter() - start,
+				"cpu_seconds": time.process_time() - start_cpu,
+				"start_rss_kb": start_rss,
+				"peak_rss_kb": get_peak_rss_kb(),
+			}
+			with os.fdopen(write_fd, "w") as f:
+				json.dump(ret, f)
+			status = 0
+		except Exception:
+			traceback.print_exc()
+		finally:
+			sys.stdout.flush()
+			# Skip the parent's cleanup handlers
+			os._exit(status)
+
+	os.close(write_fd)
+	with os.fdopen(read_fd) as f:
+		data = f.read()
+	pid, status = os.waitpid(pid, 0)
+	if status:
+		raise RuntimeError("Benchmarked process failed with status %r" % (status))
+
+	return json.loads(data)
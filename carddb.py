@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+"""
+SQLite store of processed cards, to look up a few cards without parsing the
+whole CardDefs.xml.
+
+process_cardxml.py --db writes it, with one row per entity and one row per
+tag, referenced tag, localized string, power, play requirement and entourage
+card. Cards are indexed by card id, by dbfId and by (tag, value), eg. every
+card with TAUNT in a set:
+	CardDB("cards.db").find_cards({GameTag.TAUNT: 1, GameTag.CARD_SET: CardSet.BOOMSDAY})
+
+Usage:
+	python carddb.py cards.db ID_OR_DBFID
+	python carddb.py cards.db TAG=VALUE [TAG=VALUE ...]
+"""
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+from hearthstone.cardxml import LOCALIZED_TAGS, STRING_TAGS, CardXML
+from hearthstone.enums import GameTag, PlayReq
+from lxml import etree as ElementTree
+
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE entities (
+	card_id TEXT PRIMARY KEY,
+	dbf_id INTEGER NOT NULL,
+	version INTEGER,
+	hero_power TEXT,
+	master_power TEXT
+);
+CREATE TABLE tags (
+	card_id TEXT NOT NULL, tag INTEGER NOT NULL, value INTEGER,
+	PRIMARY KEY (card_id, tag)
+) WITHOUT ROWID;
+CREATE TABLE referenced_tags (
+	card_id TEXT NOT NULL, tag INTEGER NOT NULL, value INTEGER,
+	PRIMARY KEY (card_id, tag)
+) WITHOUT ROWID;
+CREATE TABLE strings (
+	card_id TEXT NOT NULL, tag INTEGER NOT NULL, locale TEXT NOT NULL, value TEXT,
+	PRIMARY KEY (card_id, tag, locale)
+) WITHOUT ROWID;
+CREATE TABLE powers (
+	card_id TEXT NOT NULL, position INTEGER NOT NULL, definition TEXT,
+	PRIMARY KEY (card_id, position)
+) WITHOUT ROWID;
+-- In the order of the original requirements, by rowid
+CREATE TABLE play_requirements (
+	card_id TEXT NOT NULL, position INTEGER NOT NULL, req_id INTEGER NOT NULL, param INTEGER
+);
+CREATE TABLE entourage (
+	card_id TEXT NOT NULL, position INTEGER NOT NULL, entourage_id TEXT,
+	PRIMARY KEY (card_id, position)
+) WITHOUT ROWID;
+"""
+
+# Created once the rows are in, which is faster than maintaining them
+INDEXES = """
+CREATE INDEX entities_dbf_id ON entities (dbf_id);
+CREATE INDEX play_requirements_card_id ON play_requirements (card_id);
+CREATE INDEX tags_tag_value ON tags (tag, value);
+CREATE INDEX referenced_tags_tag_value ON referenced_tags (tag, value);
+"""
+
+# Locale of the non-localized strings (ARTISTNAME, LocalizationNotes)
+NO_LOCALE = ""
+
+
+def _get_tag(value):
+	try:
+		return GameTag(value)
+	except ValueError:
+		return value
+
+
+def _get_play_req(value):
+	try:
+		return PlayReq(value)
+	except ValueError:
+		return value
+
+
+def write_card_db(filename, entities, build=None):
+	"""
+	Write the cards of the iterable entities to a new database at filename,
+	replacing it if it exists.
+	Only what CardXML.to_xml() writes is stored: tags with a false value and
+	empty strings are left out.
+	"""
+	rows = {
+		"entities": [], "tags": [], "referenced_tags": [], "strings": [],
+		"powers": [], "play_requirements": [], "entourage": [],
+	}
+
+	for entity in entities:
+		id = entity.id
+		rows["entities"].append((
+			id, entity.dbf_id, entity.version, entity.hero_power, entity.master_power or None
+		))
+		rows["tags"] += [(id, int(tag), int(value)) for tag, value in entity.tags.items() if value]
+		rows["referenced_tags"] += [
+			(id, int(tag), int(value)) for tag, value in entity.referenced_tags.items()
+		]
+
+		for tag in LOCALIZED_TAGS:
+			for locale, value in entity.strings[tag].items():
+				if value:
+					rows["strings"].append((id, int(tag), locale, str(value)))
+		for tag in STRING_TAGS:
+			if entity.strings[tag]:
+				rows["strings"].append((id, int(tag), NO_LOCALE, entity.strings[tag]))
+
+		for position, power in enumerate(entity.powers):
+			rows["powers"].append((id, position, power["definition"]))
+			for req_id, param in power.get("requirements", {}).items():
+				rows["play_requirements"].append((id, position, int(req_id), int(param or 0)))
+
+		for position, entourage in enumerate(entity.entourage):
+			rows["entourage"].append((id, position, entourage))
+
+	tmpname = filename + ".tmp"
+	if os.path.exists(tmpname):
+		os.remove(tmpname)
+
+	print("Writing to %r" % (filename))
+	connection = sqlite3.connect(tmpname)
+	try:
+		# Nothing to recover: the file only replaces filename once complete
+		connection.execute("PRAGMA journal_mode = OFF")
+		connection.execute("PRAGMA synchronous = OFF")
+		connection.executescript(SCHEMA)
+		with connection:
+			connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+				("schema_version", str(SCHEMA_VERSION)),
+				("build", str(build) if build is not None else None),
+			])
+			for table, table_rows in rows.items():
+				placeholders = ", ".join("?" * len(table_rows[0])) if table_rows else ""
+				if placeholders:
+					connection.executemany(
+						"INSERT INTO %s VALUES (%s)" % (table, placeholders), table_rows
+					)
+		connection.executescript(INDEXES)
+		connection.execute("ANALYZE")
+	finally:
+		connection.close()
+
+	os.replace(tmpname, filename)
+
+
+class CardDB:
+	def __init__(self, filename):
+		# Read-only, so that a missing file is an error rather than an empty database
+		uri = "file:%s?mode=ro" % (pathname2url(os.path.abspath(filename)))
+		self.connection = sqlite3.connect(uri, uri=True)
+
+	def close(self):
+		self.connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	@property
+	def build(self):
+		row = self.connection.execute("SELECT value FROM meta WHERE key = 'build'").fetchone()
+		return int(row[0]) if row and row[0] else None
+
+	def get_card_id(self, key):
+		"""
+		Return the card id of a card by id (str) or dbfId (int), or None.
+		"""
+		if isinstance(key, int):
+			row = self.connection.execute(
+				"SELECT card_id FROM entities WHERE dbf_id = ?", (key, )
+			).fetchone()
+		else:
+			row = self.connection.execute(
+				"SELECT card_id FROM entities WHERE card_id = ?", (key, )
+			).fetchone()
+		return row[0] if row else None
+
+	def get_card(self, key, locale="enUS"):
+		"""
+		Return the CardXML of a card by id (str) or dbfId (int), the same as
+		loaded from CardDefs.xml. Raises KeyError if there is no such card.
+		"""
+		id = self.get_card_id(key)
+		if id is None:
+			raise KeyError(key)
+
+		query = self.connection.execute
+		dbf_id, version, hero_power, master_power = query(
+			"SELECT dbf_id, version, hero_power, master_power FROM entities WHERE card_id = ?",
+			(id, )
+		).fetchone()
+
+		card = CardXML(id, locale)
+		card.dbf_id = dbf_id
+		card.version = version
+		card.hero_power = hero_power
+		card.master_power = master_power
+
+		for tag, value in query("SELECT tag, value FROM tags WHERE card_id = ? ORDER BY tag", (id, )):
+			tag = _get_tag(tag)
+			if tag == GameTag.HERO_POWER:
+				# Like CardXML.from_xml(), which only keeps it as hero_power
+				continue
+			card.tags[tag] = value
+
+		for tag, value in query(
+			"SELECT tag, value FROM referenced_tags WHERE card_id = ? ORDER BY tag", (id, )
+		):
+			card.referenced_tags[_get_tag(tag)] = value
+
+		for tag, locale, value in query(
+			"SELECT tag, locale, value FROM strings WHERE card_id = ? ORDER BY tag, locale", (id, )
+		):
+			tag = _get_tag(tag)
+			if locale == NO_LOCALE:
+				card.strings[tag] = value
+			else:
+				card.strings.setdefault(tag, {})[locale] = value
+
+		for position, definition in query(
+			"SELECT position, definition FROM powers WHERE card_id = ? ORDER BY position", (id, )
+		):
+			card.powers.append({"definition": definition, "requirements": {}})
+		for position, req_id, param in query(
+			"SELECT position, req_id, param FROM play_requirements WHERE card_id = ? ORDER BY rowid",
+			(id, )
+		):
+			card.powers[position]["requirements"][_get_play_req(req_id)] = param
+
+		card.entourage = [row[0] for row in query(
+			"SELECT entourage_id FROM entourage WHERE card_id = ? ORDER BY position", (id, )
+		)]
+
+		return card
+
+	def find_cards(self, tags):
+		"""
+		Return the sorted ids of the cards with every tag: value of the dict tags.
+		"""
+		if not tags:
+			return sorted(row[0] for row in self.connection.execute("SELECT card_id FROM entities"))
+
+		query = " INTERSECT ".join(
+			["SELECT card_id FROM tags WHERE tag = ? AND value = ?"] * len(tags)
+		) + " ORDER BY card_id"
+		params = []
+		for tag, value in tags.items():
+			params += [int(tag), int(value)]
+
+		return [row[0] for row in self.connection.execute(query, params)]
+
+
+def parse_tag_filter(s):
+	tag, value = s.split("=", 1)
+	tag = int(tag) if tag.isdigit() else GameTag[tag]
+	return tag, int(value)
+
+
+def main():
+	path, keys = sys.argv[1], sys.argv[2:]
+
+	with CardDB(path) as db:
+		if keys and all("=" in key for key in keys):
+			for id in db.find_cards(dict(parse_tag_filter(key) for key in keys)):
+				print(id)
+		else:
+			for key in keys:
+				if key.isdigit():
+					key = int(key)
+				xml = db.get_card(key).to_xml()
+				sys.stdout.write(ElementTree.tostring(xml, encoding="unicode", pretty_print=True))
+
+
+if __name__ == "__main__":
+	main()
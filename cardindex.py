@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Random access to single cards in a cards.json file.
+
+generate_hearthstonejson.py --index writes a sidecar index next to each
+cards.json (cards.index.json), mapping every card "id" and "dbfId" to the
+byte offset and length of the card within the JSON array:
+	{"file": "cards.json", "size": ..., "ids": {id: [offset, length]},
+	"dbfIds": {dbfId: [offset, length]}}
+
+Usage: python cardindex.py path/to/cards.json|URL ID_OR_DBFID
+"""
+import json
+import mmap
+import os
+import sys
+from urllib.request import Request, urlopen
+
+
+INDEX_SUFFIX = ".index.json"
+
+
+def get_index_path(path):
+	"""
+	Return the path (or URL) of the sidecar index of a cards.json file.
+	"""
+	base, ext = os.path.splitext(path)
+	return base + INDEX_SUFFIX
+
+
+class CardIndexWriter:
+	def __init__(self, filename, data_filename):
+		self.filename = filename
+		self.data_filename = data_filename
+		self.ids = {}
+		self.dbf_ids = {}
+
+	def add(self, obj, offset, length):
+		self.ids[obj["id"]] = [offset, length]
+		if obj.get("dbfId"):
+			self.dbf_ids[str(obj["dbfId"])] = [offset, length]
+
+	def close(self, size):
+		print("Writing to %r" % (self.filename))
+		# May be hardlinked from a previous build, don't write through it
+		if os.path.lexists(self.filename):
+			os.unlink(self.filename)
+		with open(self.filename, "w", encoding="utf-8") as f:
+			json.dump({
+				"file": os.path.basename(self.data_filename),
+				"size": size,
+				"ids": self.ids,
+				"dbfIds": self.dbf_ids,
+			}, f, separators=(",", ":"), sort_keys=True)
+
+
+class CardIndex:
+	def __init__(self, data):
+		self.data = data
+
+	@classmethod
+	def from_file(cls, filename):
+		with open(filename, "r", encoding="utf-8") as f:
+			return cls(json.load(f))
+
+	@classmethod
+	def from_url(cls, url):
+		with urlopen(url) as response:
+			return cls(json.loads(response.read().decode("utf-8")))
+
+	@property
+	def size(self):
+		return self.data["size"]
+
+	def lookup(self, key):
+		"""
+		Return the (offset, length) of a card, by id (str) or dbfId (int).
+		Raises KeyError if the card is not in the index.
+		"""
+		if isinstance(key, int):
+			offset, length = self.data["dbfIds"][str(key)]
+		else:
+			offset, length = self.data["ids"][key]
+		return offset, length
+
+
+def read_card(filename, key, index=None):
+	"""
+	Read a single card from a local cards.json by mapping the file.
+	"""
+	if index is None:
+		index = CardIndex.from_file(get_index_path(filename))
+	offset, length = index.lookup(key)
+
+	with open(filename, "rb") as f:
+		if os.fstat(f.fileno()).st_size != index.size:
+			raise ValueError("Index is out of date for %r" % (filename))
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			return json.loads(data[offset:offset + length].decode("utf-8"))
+
+
+def fetch_card(url, key, index=None):
+	"""
+	Fetch a single card from a remote cards.json with an HTTP range request.
+	The range applies to the uncompressed file, so no Accept-Encoding is sent.
+	"""
+	if index is None:
+		index = CardIndex.from_url(get_index_path(url))
+	offset, length = index.lookup(key)
+
+	request = Request(url, headers={"Range": "bytes=%i-%i" % (offset, offset + length - 1)})
+	with urlopen(request) as response:
+		if response.status == 206:
+			data = response.read()
+		else:
+			# The server ignored the range, skip to the card
+			data = response.read()[offset:offset + length]
+
+	if len(data) != length:
+		raise ValueError("Short read for %r in %r" % (key, url))
+
+	return json.loads(data.decode("utf-8"))
+
+
+def main():
+	path, key = sys.argv[1:3]
+	if key.isdigit():
+		key = int(key)
+
+	if "://" in path:
+		card = fetch_card(path, key)
+	else:
+		card = read_card(path, key)
+
+	json.dump(card, sys.stdout, ensure_ascii=False, indent="\t", sort_keys=True)
+	sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+"""
+Compact columnar storage for serialized cards.
+
+Layout (little-endian):
+	b"HSJC", uint32 header length, UTF-8 JSON header, data blobs
+
+The header lists the row count, the shared string table and one entry per
+field ("column"), each with the offset and length of its blobs (relative to
+the start of the data). Every column has a presence bitmap (one bit per row)
+followed by its values:
+	bool:     one byte per row
+	int:      one int32/int64 per row
+	enum:     one uint16 per row, indexing the column's "values" in the header
+	str:      one uint32 per row, indexing the shared string table
+	json:     like str, the string being the JSON encoding of the value
+	enumlist: uint32 row offsets (rows + 1), then one uint16 per item
+	strlist:  uint32 row offsets (rows + 1), then one uint32 string per item
+
+The shared string table is a uint32 count, uint32 offsets (count + 1) and the
+concatenated UTF-8 strings.
+"""
+import json
+import mmap
+import os
+import sys
+from array import array
+
+
+MAGIC = b"HSJC"
+VERSION = 1
+ALIGNMENT = 8
+
+# Enum codes are stored as uint16
+MAX_ENUM_VALUES = 2 ** 16
+
+JSON_KWARGS = {
+	"ensure_ascii": False,
+	"separators": (",", ":"),
+	"sort_keys": True,
+}
+
+
+def _to_bytes(values, typecode):
+	ret = array(typecode, values)
+	if sys.byteorder != "little":
+		ret.byteswap()
+	return ret.tobytes()
+
+
+def _from_buffer(buf, typecode):
+	if sys.byteorder == "little":
+		return buf.cast(typecode)
+	ret = array(typecode, buf.tobytes())
+	ret.byteswap()
+	return ret
+
+
+def _guess_type(name, values, enum_fields):
+	values = [v for v in values if v is not None]
+	if all(isinstance(v, bool) for v in values):
+		return "bool"
+	if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+		return "int"
+	if all(isinstance(v, str) for v in values):
+		if name in enum_fields and len(set(values)) <= MAX_ENUM_VALUES:
+			return "enum"
+		return "str"
+	if all(isinstance(v, list) and all(isinstance(i, str) for i in v) for v in values):
+		if name in enum_fields and len({i for v in values for i in v}) <= MAX_ENUM_VALUES:
+			return "enumlist"
+		return "strlist"
+	return "json"
+
+
+class StringTable:
+	def __init__(self):
+		self.strings = []
+		self.indexes = {}
+
+	def add(self, s):
+		if s not in self.indexes:
+			self.indexes[s] = len(self.strings)
+			self.strings.append(s)
+		return self.indexes[s]
+
+	def to_bytes(self):
+		data = [s.encode("utf-8") for s in self.strings]
+		offsets = [0]
+		for s in data:
+			offsets.append(offsets[-1] + len(s))
+
+		return _to_bytes([len(data)] + offsets, "I") + b"".join(data)
+
+
+class ColumnarWriter:
+	"""
+	Collects serialized cards and writes them as columns.
+	Fields listed in enum_fields are dictionary-encoded per column, all other
+	strings go through a single shared string table.
+	"""
+
+	def __init__(self, filename, enum_fields=()):
+		self.filename = filename
+		self.enum_fields = set(enum_fields)
+		self.count = 0
+		self.columns = {}
+
+	def add(self, obj):
+		for k, v in obj.items():
+			if k not in self.columns:
+				self.columns[k] = [None] * self.count
+			self.columns[k].append(v)
+
+		self.count += 1
+		for values in self.columns.values():
+			if len(values) < self.count:
+				values.append(None)
+
+	def encode_column(self, name, values, strings):
+		type = _guess_type(name, values, self.enum_fields)
+		ret = {"type": type}
+
+		bitmap = bytearray((self.count + 7) // 8)
+		for i, v in enumerate(values):
+			if v is not None:
+				bitmap[i // 8] |= 1 << (i % 8)
+		blobs = [bytes(bitmap)]
+
+		if type == "bool":
+			blobs.append(bytes(bool(v) for v in values))
+		elif type == "int":
+			ints = [v or 0 for v in values]
+			typecode = "i" if all(-2 ** 31 <= v < 2 ** 31 for v in ints) else "q"
+			ret["typecode"] = typecode
+			blobs.append(_to_bytes(ints, typecode))
+		elif type in ("enum", "enumlist"):
+			ret["values"] = sorted({
+				item for v in values if v is not None
+				for item in (v if type == "enumlist" else [v])
+			})
+			codes = {v: i for i, v in enumerate(ret["values"])}
+			if type == "enum":
+				blobs.append(_to_bytes([codes[v] if v is not None else 0 for v in values], "H"))
+			else:
+				items, offsets = [], [0]
+				for v in values:
+					items += [codes[item] for item in v or []]
+					offsets.append(len(items))
+				blobs.append(_to_bytes(offsets, "I"))
+				blobs.append(_to_bytes(items, "H"))
+		elif type == "strlist":
+			items, offsets = [], [0]
+			for v in values:
+				items += [strings.add(item) for item in v or []]
+				offsets.append(len(items))
+			blobs.append(_to_bytes(offsets, "I"))
+			blobs.append(_to_bytes(items, "I"))
+		else:
+			if type == "json":
+				values = [json.dumps(v, **JSON_KWARGS) if v is not None else None for v in values]
+			blobs.append(_to_bytes([strings.add(v) if v is not None else 0 for v in values], "I"))
+
+		return ret, blobs
+
+	def close(self):
+		strings = StringTable()
+		header = {"version": VERSION, "count": self.count, "columns": {}}
+		data = bytearray()
+
+		def append(blob):
+			data.extend(b"\0" * (-len(data) % ALIGNMENT))
+			ret = [len(data), len(blob)]
+			data.extend(blob)
+			return ret
+
+		for name, values in sorted(self.columns.items()):
+			column, blobs = self.encode_column(name, values, strings)
+			column["blobs"] = [append(blob) for blob in blobs]
+			header["columns"][name] = column
+
+		header["strings"] = append(strings.to_bytes())
+
+		header_data = json.dumps(header, **JSON_KWARGS).encode("utf-8")
+		header_data += b" " * (-(len(header_data) + 8) % ALIGNMENT)
+
+		print("Writing to %r" % (self.filename))
+		# May be hardlinked from a previous build, don't write through it
+		if os.path.lexists(self.filename):
+			os.unlink(self.filename)
+		with open(self.filename, "wb") as f:
+			f.write(MAGIC)
+			f.write(_to_bytes([len(header_data)], "I"))
+			f.write(header_data)
+			f.write(data)
+
+
+class ColumnarCards:
+	"""
+	Lazy reader for a file written by ColumnarWriter.
+	Only the header is parsed on open; values are decoded from the mapped file
+	when they are accessed.
+	"""
+
+	def __init__(self, filename):
+		self._f = open(filename, "rb")
+		self._mmap = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+		self._buf = memoryview(self._mmap)
+
+		if self._buf[:4] != MAGIC:
+			self.close()
+			raise ValueError("%r is not a columnar cards file" % (filename))
+
+		header_length = _from_buffer(self._buf[4:8], "I")[0]
+		self.header = json.loads(bytes(self._buf[8:8 + header_length]).decode("utf-8"))
+		if self.header["version"] != VERSION:
+			self.close()
+			raise ValueError("Unsupported columnar version: %r" % (self.header["version"]))
+
+		self._data = self._buf[8 + header_length:]
+		self._columns = {}
+
+		offset, length = self.header["strings"]
+		strings = self._data[offset:offset + length]
+		count = _from_buffer(strings[:4], "I")[0]
+		self._string_offsets = _from_buffer(strings[4:8 + count * 4], "I")
+		self._string_data = strings[8 + count * 4:]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def close(self):
+		self._columns = {}
+		for attr in ("_string_offsets", "_string_data", "_data", "_buf"):
+			view = self.__dict__.pop(attr, None)
+			if isinstance(view, memoryview):
+				view.release()
+		self._mmap.close()
+		self._f.close()
+
+	def __len__(self):
+		return self.header["count"]
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield self[i]
+
+	def __getitem__(self, i):
+		if not -len(self) <= i < len(self):
+			raise IndexError(i)
+		i %= len(self)
+
+		ret = {}
+		for name in self.fields:
+			column = self._get_column(name)
+			if column["bitmap"][i // 8] & (1 << (i % 8)):
+				ret[name] = column["get"](i)
+		return ret
+
+	@property
+	def fields(self):
+		return list(self.header["columns"])
+
+	def column(self, name):
+		"""
+		Return every value of a field, None where a card doesn't have it.
+		"""
+		column = self._get_column(name)
+		bitmap, get = column["bitmap"], column["get"]
+		return [
+			get(i) if bitmap[i // 8] & (1 << (i % 8)) else None
+			for i in range(len(self))
+		]
+
+	def get_string(self, index):
+		start, end = self._string_offsets[index], self._string_offsets[index + 1]
+		return bytes(self._string_data[start:end]).decode("utf-8")
+
+	def _get_column(self, name):
+		if name not in self._columns:
+			self._columns[name] = self._load_column(self.header["columns"][name])
+		return self._columns[name]
+
+	def _load_column(self, column):
+		blobs = [self._data[offset:offset + length] for offset, length in column["blobs"]]
+		type = column["type"]
+		ret = {"bitmap": blobs[0]}
+
+		if type == "bool":
+			values = blobs[1]
+			ret["get"] = lambda i: bool(values[i])
+		elif type == "int":
+			values = _from_buffer(blobs[1], column["typecode"])
+			ret["get"] = values.__getitem__
+		elif type == "enum":
+			names, codes = column["values"], _from_buffer(blobs[1], "H")
+			ret["get"] = lambda i: names[codes[i]]
+		elif type == "enumlist":
+			names = column["values"]
+			offsets, codes = _from_buffer(blobs[1], "I"), _from_buffer(blobs[2], "H")
+			ret["get"] = lambda i: [names[c] for c in codes[offsets[i]:offsets[i + 1]]]
+		elif type == "strlist":
+			offsets, indexes = _from_buffer(blobs[1], "I"), _from_buffer(blobs[2], "I")
+			ret["get"] = lambda i: [
+				self.get_string(s) for s in indexes[offsets[i]:offsets[i + 1]]
+			]
+		elif type == "str":
+			indexes = _from_buffer(blobs[1], "I")
+			ret["get"] = lambda i: self.get_string(indexes[i])
+		elif type == "json":
+			indexes = _from_buffer(blobs[1], "I")
+			ret["get"] = lambda i: json.loads(self.get_string(indexes[i]))
+		else:
+			raise NotImplementedError("Unknown column type: %r" % (type))
+
+		return ret
+
+
+def main():
+	# Dump a columnar file back to JSON
+	with ColumnarCards(sys.argv[1]) as cards:
+		json.dump(list(cards), sys.stdout, **JSON_KWARGS)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,78 @@
+"""
+Writing a file along with its precompressed variants (gzip and brotli), as
+served to clients that accept them.
+"""
+import gzip
+import os
+
+try:
+	import brotli
+except ImportError:
+	brotli = None
+
+
+COMPRESSION_FORMATS = ("gz", "br")
+
+# Files are compressed once per build and fetched many times, so favour ratio over speed
+BROTLI_QUALITY = 11
+
+
+def open_new(filename, mode="wb"):
+	# The file may be hardlinked from a previous build (see link_or_copy() in
+	# generate_hearthstonejson.py), don't truncate the previous build's copy through it
+	if os.path.lexists(filename):
+		os.unlink(filename)
+	return open(filename, mode)
+
+
+class CompressingWriter:
+	"""
+	Text writer for a UTF-8 file which also writes precompressed variants
+	(filename.gz, filename.br) from the same stream.
+	"""
+
+	def __init__(self, filename, compress=()):
+		if "br" in compress and brotli is None:
+			raise RuntimeError("Brotli compression requires the brotli package")
+
+		self.filename = filename
+		self.offset = 0
+		self._f = open_new(filename)
+		self._gzip = None
+		self._brotli = None
+
+		if "gz" in compress:
+			# No name or mtime in the header, so that identical input gives identical output
+			self._gzip_f = open_new(filename + ".gz")
+			self._gzip = gzip.GzipFile(filename="", mode="wb", fileobj=self._gzip_f, mtime=0)
+		if "br" in compress:
+			self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+			self._brotli_f = open_new(filename + ".br")
+
+	def write(self, s):
+		"""
+		Write a string, returning the number of bytes written to the plain file.
+		"""
+		data = s.encode("utf-8")
+		self._f.write(data)
+		self.offset += len(data)
+		if self._gzip:
+			self._gzip.write(data)
+		if self._brotli:
+			self._brotli_f.write(self._brotli.process(data))
+		return len(data)
+
+	def close(self):
+		self._f.close()
+		if self._gzip:
+			self._gzip.close()
+			self._gzip_f.close()
+		if self._brotli:
+			self._brotli_f.write(self._brotli.finish())
+			self._brotli_f.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
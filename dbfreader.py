@@ -0,0 +1,34 @@
+"""
+Streaming reader for DBF XML files (CARD.xml, CARD_TAG.xml, ...).
+
+hearthstone.dbf.Dbf.load() parses the whole document and builds every record
+before returning; iter_dbf_records() yields the same records while parsing,
+freeing each one as it goes.
+"""
+from hearthstone.dbf import Dbf
+from lxml import etree as ElementTree
+
+
+def iter_dbf_records(path, columns=None):
+	"""
+	Yield the records of a DBF XML file as dicts, like Dbf.load(path).records.
+	columns, if given, is filled with the column types as they are parsed
+	(columns come before the records in a DBF file).
+	"""
+	dbf = Dbf()
+	for event, elem in ElementTree.iterparse(path, events=("end", ), tag=("Column", "Record")):
+		if elem.tag == "Column":
+			dbf.columns[elem.attrib["name"]] = elem.attrib["type"]
+			if columns is not None:
+				columns[elem.attrib["name"]] = elem.attrib["type"]
+		else:
+			# Same as Dbf._deserialize_record(), without an XPath query per record
+			yield {
+				field.attrib["column"]: dbf._deserialize_value(
+					field, dbf.columns[field.attrib["column"]]
+				) for field in elem if field.tag == "Field"
+			}
+
+		elem.clear()
+		while elem.getprevious() is not None:
+			del elem.getparent()[0]
@@ -1,11 +1,20 @@
 #!/usr/bin/env python
+import hashlib
+import inspect
+import io
 import json
+import multiprocessing
 import os
 import sys
+import traceback
 from argparse import ArgumentParser
-from PIL import Image, ImageOps
+from contextlib import redirect_stderr, redirect_stdout
+from PIL import ImageOps
 from unitypack.environment import UnityEnvironment
 
+from cardtiles import crop_tiles, get_tile_props, resample_tile
+from generate_hearthstonejson import link_or_copy, sha1_json
+
 
 guid_to_path = {}
 
@@ -117,88 +126,27 @@ def extract_info(files, filter_ids):
 	return cards, textures
 
 
-# Deck tile generation
-TEX_COORDS = [(0.0, 0.3856), (1.0, 0.6144)]
-OUT_DIM = 256
-OUT_WIDTH = round(TEX_COORDS[1][0] * OUT_DIM - TEX_COORDS[0][0] * OUT_DIM)
-OUT_HEIGHT = round(TEX_COORDS[1][1] * OUT_DIM - TEX_COORDS[0][1] * OUT_DIM)
-
-
-def get_rect(ux, uy, usx, usy, sx, sy, ss, tex_dim=512):
-	# calc the coords
-	tl_x = ((TEX_COORDS[0][0] + sx) * ss) * usx + ux
-	tl_y = ((TEX_COORDS[0][1] + sy) * ss) * usy + uy
-	br_x = ((TEX_COORDS[1][0] + sx) * ss) * usx + ux
-	br_y = ((TEX_COORDS[1][1] + sy) * ss) * usy + uy
-
-	# adjust if x coords cross-over
-	horiz_delta = tl_x - br_x
-	if horiz_delta > 0:
-		tl_x -= horiz_delta
-		br_x += horiz_delta
-
-	# get the bar rectangle at tex_dim size
-	x = round(tl_x * tex_dim)
-	y = round(tl_y * tex_dim)
-	width = round(abs((br_x - tl_x) * tex_dim))
-	height = round(abs((br_y - tl_y) * tex_dim))
-
-	# adjust x and y, so that texture is "visible"
-	x = (x + width) % tex_dim - width
-	y = (y + height) % tex_dim - height
-
-	# ??? to cater for some special cases
-	min_visible = tex_dim / 4
-	while x + width < min_visible:
-		x += tex_dim
-	while y + height < 0:
-		y += tex_dim
-
-	# ensure wrap around is used
-	if x < 0:
-		x += tex_dim
-
-	return (x, y, width, height)
-
-
-def generate_tile_image(img, tile):
-	if (img.width, img.height) != (512, 512):
-		img = img.resize((512, 512), Image.ANTIALIAS)
-
-	# tile the image horizontally (x2 is enough),
-	# some cards need to wrap around to create a bar (e.g. Muster for Battle),
-	# also discard alpha channel (e.g. Soulfire, Mortal Coil)
-	tiled = Image.new("RGB", (img.width * 2, img.height))
-	tiled.paste(img, (0, 0))
-	tiled.paste(img, (img.width, 0))
-
-	props = (-0.2, 0.25, 1, 1, 0, 0, 1, img.width)
-	if tile:
-		props = (
-			tile["m_TexEnvs"]["_MainTex"]["m_Offset"]["x"],
-			tile["m_TexEnvs"]["_MainTex"]["m_Offset"]["y"],
-			tile["m_TexEnvs"]["_MainTex"]["m_Scale"]["x"],
-			tile["m_TexEnvs"]["_MainTex"]["m_Scale"]["y"],
-			tile["m_Floats"].get("_OffsetX", 0.0),
-			tile["m_Floats"].get("_OffsetY", 0.0),
-			tile["m_Floats"].get("_Scale", 1.0),
-		)
-
-	x, y, width, height = get_rect(*props)
-
-	bar = tiled.crop((x, y, x + width, y + height))
-	bar = ImageOps.flip(bar)
-	# negative x scale means horizontal flip
-	if props[2] < 0:
-		bar = ImageOps.mirror(bar)
-
-	return bar.resize((OUT_WIDTH, OUT_HEIGHT), Image.LANCZOS)
+class TextureRef:
+	"""
+	A texture by the name of its asset and its path id. Unlike the pointers
+	of an environment, it can be sent to a worker process and resolved in
+	the worker's own environment.
+	"""
+	def __init__(self, pptr):
+		self.asset_name = pptr.asset.name
+		self.path_id = pptr.path_id
+		self.environment = None
+
+	def resolve(self):
+		asset = self.environment.get_asset_by_filename(self.asset_name.lower())
+		return asset.objects[self.path_id].read()
 
 
 def get_dir(basedir, dirname):
 	ret = os.path.join(basedir, dirname)
 	if not os.path.exists(ret):
-		os.makedirs(ret)
+		# Worker processes may get there at the same time
+		os.makedirs(ret, exist_ok=True)
 	return ret
 
 
@@ -209,35 +157,108 @@ def get_filename(basedir, dirname, name, ext=".png"):
 	return path, os.path.exists(path)
 
 
-def do_texture(path, id, textures, values, thumb_sizes, args):
-	print("Parsing %r (%r)" % (id, path))
-	if not path:
-		print("%r does not have a texture" % (id))
-		return
-
-	if path not in textures:
-		print("Path %r not found for %r" % (path, id))
-		return
-
-	pptr = textures[path]
-	texture = pptr.resolve()
-	flipped = None
-
-	filename, exists = get_filename(args.outdir, args.orig_dir, id, ext=".png")
-	if not (args.skip_existing and exists):
-		print("-> %r" % (filename))
-		flipped = ImageOps.flip(texture.image).convert("RGB")
-		flipped.save(filename)
+class RenderPlan:
+	"""
+	The images outputs are made from, for one texture. The texture is
+	decoded at most once, and each derived image computed at most once,
+	however many cards, formats and sizes are written from it.
+	"""
+	def __init__(self, texture, tile_props=()):
+		self.texture = texture
+		# The tile props of all the texture's cards, whose bars are cropped together
+		self.tile_props = list(dict.fromkeys(tile_props))
+		self.decodes = 0
+		self._images = {}
+
+	def _get(self, key, func, *args):
+		if key not in self._images:
+			self._images[key] = func(*args)
+		return self._images[key]
+
+	def _decode(self):
+		self.decodes += 1
+		return self.texture.image
+
+	def _hash_texture(self):
+		ret = hashlib.sha1(self.texture.image_data)
+		params = [int(self.texture.format), self.texture.width, self.texture.height]
+		ret.update(json.dumps(params).encode("utf-8"))
+		return ret.hexdigest()
+
+	@property
+	def texture_hash(self):
+		# Of the encoded texture data, which doesn't need a decode
+		return self._get("texture_hash", self._hash_texture)
+
+	@property
+	def image(self):
+		return self._get("image", self._decode)
+
+	@property
+	def flipped(self):
+		return self._get("flipped", lambda: ImageOps.flip(self.image).convert("RGB"))
+
+	def _crop_tiles(self):
+		return dict(zip(self.tile_props, crop_tiles(self.image, self.tile_props)))
+
+	def _render_tile(self, tile_props):
+		bars = self._get("tile_bars", self._crop_tiles)
+		# Each tile is resampled once, its bar isn't needed after that
+		bar = bars.pop(tile_props, None)
+		if bar is None:
+			bar = crop_tiles(self.image, [tile_props])[0]
+		return resample_tile(bar)
+
+	def get_tile(self, tile_props):
+		return self._get(("tile", tile_props), self._render_tile, tile_props)
+
+	def get_thumbnail(self, size):
+		return self._get(("thumbnail", size), lambda: self.flipped.resize((size, size)))
+
+	def render(self, kind, size=None, tile_props=None):
+		if kind == "orig":
+			return self.flipped
+		elif kind == "tile":
+			return self.get_tile(tile_props)
+		return self.get_thumbnail(size)
+
+
+class RenderGroup:
+	"""
+	Cards sharing a texture: the texture's RenderPlan, and the first file
+	written for each distinct output, which the other cards link to.
+	"""
+	def __init__(self, path, tile_props=()):
+		self.path = path
+		self.tile_props = tile_props
+		self.plan = None
+		self.written = {}
+
+
+def group_cards(cards):
+	"""
+	Group cards, a sorted list of (id, path, tile_props), by texture path.
+	Returns a list of (path, [(id, tile_props), ...]) in the order of each
+	group's first card.
+	"""
+	ret = {}
+	for id, path, tile_props in cards:
+		ret.setdefault(path, []).append((id, tile_props))
+	return list(ret.items())
+
+
+def get_outputs(id, thumb_sizes, args):
+	"""
+	Return the (filename, exists, kind, size) of the files of a card, kind
+	being "orig", "tile" or "thumbnail" (of the given size).
+	"""
+	ret = [get_filename(args.outdir, args.orig_dir, id, ext=".png") + ("orig", None)]
 
 	for format in args.formats:
 		ext = "." + format
 
 		if not args.skip_tiles:
-			filename, exists = get_filename(args.outdir, args.tiles_dir, id, ext=ext)
-			if not (args.skip_existing and exists):
-				tile_texture = generate_tile_image(texture.image, values["tile"])
-				print("-> %r" % (filename))
-				tile_texture.save(filename)
+			ret.append(get_filename(args.outdir, args.tiles_dir, id, ext=ext) + ("tile", None))
 
 		if ext == ".png":
 			# skip png generation for thumbnails
@@ -249,13 +270,196 @@ def do_texture(path, id, textures, values, thumb_sizes, args):
 
 		for sz in thumb_sizes:
 			thumb_dir = "%ix" % (sz)
-			filename, exists = get_filename(args.outdir, thumb_dir, id, ext=ext)
-			if not (args.skip_existing and exists):
-				if not flipped:
-					flipped = ImageOps.flip(texture.image).convert("RGB")
-				thumb_texture = flipped.resize((sz, sz))
-				print("-> %r" % (filename))
-				thumb_texture.save(filename)
+			ret.append(get_filename(args.outdir, thumb_dir, id, ext=ext) + ("thumbnail", sz))
+
+	return ret
+
+
+def save_image(img, filename):
+	# The file may be a hardlink from a previous run, don't write through it
+	if os.path.lexists(filename):
+		os.unlink(filename)
+	img.save(filename)
+
+
+TEXTURE_MANIFEST_FILENAME = "texture-manifest.json"
+# Bump when the rendering changes, to re-render everything
+TEXTURE_MANIFEST_VERSION = 1
+
+
+class TextureManifest:
+	"""
+	Records a hash of the inputs of every written file: the source texture
+	data, the card's tile material properties, the output parameters and the
+	source of the renderer and of cardtiles. Files whose inputs match the
+	previous run's are not rendered again.
+	"""
+	def __init__(self, outdir):
+		self.outdir = outdir
+		self.path = os.path.join(outdir, TEXTURE_MANIFEST_FILENAME)
+		self.files = {}
+		# Files written by this run (by this task, in a worker process)
+		self.updated = {}
+
+		renderer_hash = hashlib.sha1()
+		for module in (__file__, inspect.getfile(crop_tiles)):
+			with open(module, "rb") as f:
+				renderer_hash.update(f.read())
+		self.renderer_hash = renderer_hash.hexdigest()
+
+		if os.path.exists(self.path):
+			with open(self.path, "r") as f:
+				previous = json.load(f)
+			if previous.get("version") == TEXTURE_MANIFEST_VERSION:
+				self.files = previous["files"]
+
+	def hash_output(self, texture_hash, key):
+		return sha1_json([TEXTURE_MANIFEST_VERSION, self.renderer_hash, texture_hash, key])
+
+	def is_current(self, filename, digest):
+		path = os.path.relpath(filename, self.outdir)
+		return self.files.get(path) == digest and os.path.exists(filename)
+
+	def add(self, filename, digest):
+		self.updated[os.path.relpath(filename, self.outdir)] = digest
+
+	def save(self):
+		self.files.update(self.updated)
+		print("Writing to %r" % (self.path))
+		with open(self.path, "w") as f:
+			json.dump({"version": TEXTURE_MANIFEST_VERSION, "files": self.files}, f, sort_keys=True)
+
+	def write_changed(self, filename):
+		"""
+		Write the files written by this run, relative to outdir, one per line.
+		"""
+		print("Writing to %r" % (filename))
+		with open(filename, "w") as f:
+			for path in sorted(self.updated):
+				f.write(path + "\n")
+
+
+def do_texture(path, id, textures, tile_props, thumb_sizes, args, group, manifest=None):
+	print("Parsing %r (%r)" % (id, path))
+	if not path:
+		print("%r does not have a texture" % (id))
+		return
+
+	if path not in textures:
+		print("Path %r not found for %r" % (path, id))
+		return
+
+	if group.plan is None:
+		group.plan = RenderPlan(textures[path].resolve(), group.tile_props)
+
+	for filename, exists, kind, size in get_outputs(id, thumb_sizes, args):
+		# The same output of another card in the group is the same image
+		key = (kind, size, os.path.splitext(filename)[1], tile_props if kind == "tile" else None)
+		digest = None
+		if manifest:
+			digest = manifest.hash_output(group.plan.texture_hash, key)
+			if manifest.is_current(filename, digest):
+				group.written.setdefault(key, filename)
+				continue
+		elif args.skip_existing and exists:
+			# Not linked to by other cards: it may be from an older texture
+			continue
+
+		if key in group.written:
+			print("-> %r (same as %r)" % (filename, group.written[key]))
+			link_or_copy(group.written[key], filename)
+		else:
+			print("-> %r" % (filename))
+			save_image(group.plan.render(kind, size, tile_props), filename)
+			group.written[key] = filename
+
+		if manifest:
+			manifest.add(filename, digest)
+
+
+def render_texture(path, cards, textures, thumb_sizes, args, manifest=None):
+	"""
+	Write the outputs of cards, a list of (id, tile_props) using the texture
+	at path. Returns the number of times the texture was decoded.
+	"""
+	group = RenderGroup(path, [tile_props for id, tile_props in cards])
+	for id, tile_props in cards:
+		try:
+			do_texture(path, id, textures, tile_props, thumb_sizes, args, group, manifest)
+		except Exception as e:
+			sys.stderr.write("ERROR on %r (%r): %s (Use --traceback for details)\n" % (path, id, e))
+			if args.traceback:
+				raise
+
+	if group.plan is None:
+		return 0
+	print("%r: %i card(s), %i decode(s)" % (path, len(cards), group.plan.decodes))
+	return group.plan.decodes
+
+
+_worker_state = {}
+
+
+def _init_texture_worker(files, thumb_sizes, args, manifest):
+	# Each worker reads the bundles through its own file objects
+	env = UnityEnvironment()
+	for file in files:
+		env.load(open(file, "rb"))
+	_worker_state.update(environment=env, thumb_sizes=thumb_sizes, args=args, manifest=manifest)
+
+
+def _render_texture_worker(task):
+	path, cards, texture = task
+	textures = {}
+	if texture is not None:
+		texture.environment = _worker_state["environment"]
+		textures[path] = texture
+
+	manifest = _worker_state["manifest"]
+	if manifest:
+		manifest.updated = {}
+
+	log, errors = io.StringIO(), io.StringIO()
+	decodes, error = 0, None
+	with redirect_stdout(log), redirect_stderr(errors):
+		try:
+			decodes = render_texture(
+				path, cards, textures, _worker_state["thumb_sizes"], _worker_state["args"], manifest
+			)
+		except Exception:
+			error = traceback.format_exc()
+	updated = manifest.updated if manifest else {}
+	return log.getvalue(), errors.getvalue(), decodes, updated, error
+
+
+def render_textures(groups, textures, thumb_sizes, args, manifest=None):
+	"""
+	Render groups, a list of (path, cards) as returned by group_cards(), in
+	args.jobs worker processes. The output of each group is written once it
+	is done, in order. Returns the number of texture decodes.
+	"""
+	tasks = [
+		(path, cards, TextureRef(textures[path]) if path in textures else None)
+		for path, cards in groups
+	]
+
+	ret = 0
+	context = multiprocessing.get_context("fork")
+	initargs = (args.files, thumb_sizes, args, manifest)
+	with context.Pool(args.jobs, _init_texture_worker, initargs) as pool:
+		for log, errors, decodes, updated, error in pool.imap(_render_texture_worker, tasks):
+			sys.stdout.write(log)
+			sys.stdout.flush()
+			sys.stderr.write(errors)
+			if manifest:
+				manifest.updated.update(updated)
+			if error:
+				# Only with --traceback, which stops at the first error
+				sys.stderr.write(error)
+				raise RuntimeError("Texture rendering failed in a worker process")
+			ret += decodes
+
+	return ret
 
 
 def main():
@@ -275,8 +479,21 @@ def main():
 	p.add_argument("--tiles-dir", type=str, default="tiles", help="Name of output for tiles")
 	p.add_argument("--traceback", action="store_true", help="Raise errors during conversion")
 	p.add_argument("--json-only", action="store_true", help="Only write JSON cardinfo")
+	p.add_argument(
+		"-j", "--jobs", type=int, default=1, help="Number of processes to render textures with"
+	)
+	p.add_argument(
+		"--incremental", action="store_true",
+		help="Keep a manifest of the inputs of each file and only render the changed ones"
+	)
+	p.add_argument(
+		"--changed-list", type=str,
+		help="Write the files rendered by an --incremental run to this file, one per line"
+	)
 	p.add_argument("files", nargs="+")
 	args = p.parse_args(sys.argv[1:])
+	if args.changed_list and not args.incremental:
+		p.error("--changed-list requires --incremental")
 
 	filter_ids = args.only.lower().split(",") if args.only else []
 
@@ -287,6 +504,7 @@ def main():
 	))
 
 	thumb_sizes = (256, 512)
+	to_render = []
 
 	for id, values in sorted(cards.items()):
 		if filter_ids and id.lower() not in filter_ids:
@@ -311,12 +529,37 @@ def main():
 				json.dump(d, f)
 			continue
 
-		try:
-			do_texture(path, id, textures, values, thumb_sizes, args)
-		except Exception as e:
-			sys.stderr.write("ERROR on %r (%r): %s (Use --traceback for details)\n" % (path, id, e))
-			if args.traceback:
-				raise
+		to_render.append((id, path, get_tile_props(values["tile"])))
+
+	if args.json_only:
+		return
+
+	manifest = None
+	if args.incremental:
+		# The default --outdir is the current directory
+		outdir = args.outdir or "."
+		os.makedirs(outdir, exist_ok=True)
+		manifest = TextureManifest(outdir)
+
+	# Cards sharing a texture are rendered together, each image only once
+	groups = group_cards(to_render)
+	try:
+		if args.jobs > 1:
+			decodes = render_textures(groups, textures, thumb_sizes, args, manifest)
+		else:
+			decodes = 0
+			for path, group in groups:
+				decodes += render_texture(path, group, textures, thumb_sizes, args, manifest)
+	finally:
+		# Also on --traceback errors: what was written is up to date
+		if manifest:
+			manifest.save()
+			if args.changed_list:
+				manifest.write_changed(args.changed_list)
+
+	print("Rendered %i cards from %i textures with %i texture decodes" % (
+		len(to_render), len(groups), decodes
+	))
 
 
 if __name__ == "__main__":
@@ -1,13 +1,23 @@
 #!/usr/bin/env python
+import hashlib
+import inspect
+import io
 import json
+import multiprocessing
 import os
+import shutil
 import sys
 from argparse import ArgumentParser
+from contextlib import redirect_stdout
 from enum import IntEnum
 
-from hearthstone.cardxml import load
+from hearthstone.cardxml import CardXML
 from hearthstone.enums import CardType, Faction, GameTag, Locale
-from hearthstone.utils import SCHEME_CARDS, SPELLSTONE_STRINGS
+from hearthstone.utils import SCHEME_CARDS, SPELLSTONE_STRINGS, ElementTree
+
+from cardindex import CardIndexWriter, get_index_path
+from columnar import ColumnarWriter
+from compressingwriter import COMPRESSION_FORMATS, CompressingWriter
 
 NBSP = "\u00A0"
 
@@ -85,9 +95,31 @@ MECHANICS_TAGS = [
 	GameTag.InvisibleDeathrattle,
 ]
 
-
-def json_dump(obj, filename, pretty=False):
-	print("Writing to %r" % (filename))
+# Fields holding enum names, dictionary-encoded in the columnar export
+ENUM_FIELDS = (
+	"cardClass",
+	"classes",
+	"faction",
+	"mechanics",
+	"multiClassGroup",
+	"race",
+	"rarity",
+	"referencedTags",
+	"set",
+	"type",
+)
+
+LOCALIZED_FIELDS = {
+	GameTag.CARDNAME: "name",
+	GameTag.FLAVORTEXT: "flavor",
+	GameTag.CARDTEXT_INHAND: "text",
+	GameTag.HOW_TO_EARN: "howToEarn",
+	GameTag.HOW_TO_EARN_GOLDEN: "howToEarnGolden",
+	GameTag.TARGETING_ARROW_TEXT: "targetingArrowText",
+}
+
+
+def get_json_kwargs(pretty=False):
 	kwargs = {
 		"ensure_ascii": False,
 		"separators": (",", ":"),
@@ -97,8 +129,60 @@ def json_dump(obj, filename, pretty=False):
 		kwargs["indent"] = "\t"
 		kwargs["separators"] = (",", ": ")
 
-	with open(filename, "w", encoding="utf8") as f:
-		json.dump(obj, f, **kwargs)
+	return kwargs
+
+
+def json_dump(obj, filename, pretty=False, compress=()):
+	print("Writing to %r" % (filename))
+	with CompressingWriter(filename, compress) as f:
+		json.dump(obj, f, **get_json_kwargs(pretty))
+
+
+def _iter_json_array(items, pretty=False):
+	# Yields (item, chunk) pairs, item being None for the delimiters
+	encode = json.JSONEncoder(**get_json_kwargs(pretty)).encode
+	if pretty:
+		start, separator, end = "[\n\t", ",\n\t", "\n]"
+	else:
+		start, separator, end = "[", ",", "]"
+
+	first = True
+	for item in items:
+		yield None, start if first else separator
+		first = False
+		if pretty:
+			yield item, encode(item).replace("\n", "\n\t")
+		else:
+			yield item, encode(item)
+
+	yield None, "[]" if first else end
+
+
+def iter_json_array(items, pretty=False):
+	"""
+	Encode an iterable as a JSON array, one item at a time.
+	The result is identical to json.dump() of the equivalent list.
+	"""
+	for item, chunk in _iter_json_array(items, pretty):
+		yield chunk
+
+
+def json_dump_array(items, filename, pretty=False, compress=(), index=None):
+	"""
+	Stream items to filename as a JSON array.
+	If index is given, index.add(item, offset, length) is called with the
+	byte range of every item, and index.close(size) once the file is written.
+	"""
+	print("Writing to %r" % (filename))
+	with CompressingWriter(filename, compress) as f:
+		for item, chunk in _iter_json_array(items, pretty):
+			offset = f.offset
+			length = f.write(chunk)
+			if index is not None and item is not None:
+				index.add(item, offset, length)
+
+	if index is not None:
+		index.close(f.offset)
 
 
 def show_field(card, k, v):
@@ -156,19 +240,14 @@ def clean_card_description(text, card):
 	return text, collection_text
 
 
-def serialize_card(card):
-	text, collection_text = clean_card_description(card.description, card)
-
+def serialize_card_skeleton(card):
+	"""
+	Serialize the locale-invariant part of a card.
+	The returned dict is shared between every locale export and must not be mutated.
+	"""
 	ret = {
 		"id": card.card_id,
 		"dbfId": card.dbf_id,
-		"name": card.name,
-		"flavor": card.flavortext,
-		"text": text,
-		"collectionText": collection_text,
-		"howToEarn": card.how_to_earn,
-		"howToEarnGolden": card.how_to_earn_golden,
-		"targetingArrowText": card.targeting_arrow_text,
 		"artist": card.artist,
 		"faction": card.faction,
 		"hideStats": card.hide_stats,
@@ -220,46 +299,496 @@ def serialize_card(card):
 	return ret
 
 
-def export_cards_to_file(cards, filename, locale):
-	ret = []
-	for card in cards:
-		card.locale = locale
-		ret.append(serialize_card(card))
+def serialize_card_strings(card):
+	"""
+	Serialize the localized fields of a card, in the card's current locale.
+	"""
+	text, collection_text = clean_card_description(card.description, card)
+
+	ret = {
+		"name": card.name,
+		"flavor": card.flavortext,
+		"text": text,
+		"collectionText": collection_text,
+		"howToEarn": card.how_to_earn,
+		"howToEarnGolden": card.how_to_earn_golden,
+		"targetingArrowText": card.targeting_arrow_text,
+	}
+	return {k: v for k, v in ret.items() if show_field(card, k, v)}
+
+
+def serialize_card(card, skeleton=None):
+	if skeleton is None:
+		skeleton = serialize_card_skeleton(card)
+
+	ret = skeleton.copy()
+	ret.update(serialize_card_strings(card))
+	return ret
+
+
+def serialize_skeletons(cards):
+	return {card.id: serialize_card_skeleton(card) for card in cards}
+
+
+def serialize_card_all_locales(card, skeleton):
+	ret = skeleton.copy()
+	collection_texts = {}
+
+	for tag, key in LOCALIZED_FIELDS.items():
+		value = card.strings.get(tag, {})
+		if key == "text":
+			texts = {}
+			for locale, localized_value in value.items():
+				text, collection_text = clean_card_description(localized_value, card)
+				texts[locale] = text
+				if collection_text:
+					collection_texts[locale] = collection_text
+			value = texts
+		if value:
+			ret[key] = value
+
+	if collection_texts:
+		ret["collectionText"] = collection_texts
+
+	return ret
+
+
+def dump_cards(items, filename, compress=(), sinks=(), index=None):
+	"""
+	Stream serialized cards to filename, also passing each of them to the
+	add() method of every sink (eg. a ColumnarWriter) in the same pass.
+	index (eg. a cardindex.CardIndexWriter) receives the byte range of each
+	card, see json_dump_array.
+	"""
+	def tee():
+		for obj in items:
+			for sink in sinks:
+				sink.add(obj)
+			yield obj
 
-	json_dump(ret, filename)
+	json_dump_array(tee(), filename, compress=compress, index=index)
 
+	for sink in sinks:
+		sink.close()
 
-def export_all_locales_cards_to_file(cards, filename):
-	tag_names = {
-		GameTag.CARDNAME: "name",
-		GameTag.FLAVORTEXT: "flavor",
-		GameTag.CARDTEXT_INHAND: "text",
-		GameTag.HOW_TO_EARN: "howToEarn",
-		GameTag.HOW_TO_EARN_GOLDEN: "howToEarnGolden",
-		GameTag.TARGETING_ARROW_TEXT: "targetingArrowText",
+
+def export_cards_to_file(
+	cards, filename, locale, skeletons=None, compress=(), sinks=(), index=None
+):
+	if skeletons is None:
+		skeletons = serialize_skeletons(cards)
+
+	def serialize():
+		for card in cards:
+			card.locale = locale
+			yield serialize_card(card, skeletons[card.id])
+
+	dump_cards(serialize(), filename, compress, sinks, index)
+
+
+def export_all_locales_cards_to_file(
+	cards, filename, skeletons=None, compress=(), sinks=(), index=None
+):
+	if skeletons is None:
+		skeletons = serialize_skeletons(cards)
+
+	dump_cards(
+		(serialize_card_all_locales(card, skeletons[card.id]) for card in cards),
+		filename,
+		compress,
+		sinks,
+		index
+	)
+
+
+# Name of the merged-locales export directory
+ALL_LOCALES = "all"
+
+# Fields cards are sharded by, and the directory for each field's shards
+SHARD_FIELDS = {
+	"set": "sets",
+	"cardClass": "classes",
+}
+SHARD_INDEX_FILENAME = "shards.json"
+SHARD_CARD_PATH = "cards/{id}.json"
+
+# Written to the output directory, see BuildManifest
+MANIFEST_FILENAME = "build-manifest.json"
+MANIFEST_VERSION = 1
+
+# Export state inherited by forked workers (copy-on-write), see export_cards()
+_export_state = {}
+
+
+def get_dir(basedir, dirname):
+	ret = os.path.join(basedir, dirname)
+	if not os.path.exists(ret):
+		os.makedirs(ret)
+	return ret
+
+
+def link_or_copy(src, dst):
+	if os.path.lexists(dst):
+		os.unlink(dst)
+	else:
+		os.makedirs(os.path.dirname(dst), exist_ok=True)
+	try:
+		os.link(src, dst)
+	except OSError:
+		shutil.copy2(src, dst)
+
+
+class ShardWriter:
+	"""
+	Writes the cards of a locale directory to one file per set and per class
+	(eg. sets/EXPERT1.json), and to one file per card (cards/<id>.json).
+	An index of the card ids in each shard is written to shards.json.
+	"""
+
+	def __init__(self, basedir, compress=()):
+		self.basedir = basedir
+		self.compress = compress
+		self.encode = json.JSONEncoder(**get_json_kwargs()).encode
+		self.card_ids = []
+		self.shards = {}
+		self.writers = {}
+
+	@staticmethod
+	def list_outputs(output_dir, locale, compress=()):
+		"""
+		List the files written with a locale's shards, relative to output_dir,
+		according to its existing shard index.
+		"""
+		index_path = os.path.join(locale, SHARD_INDEX_FILENAME)
+		filename = os.path.join(output_dir, index_path)
+		if not os.path.exists(filename):
+			return [index_path]
+
+		with open(filename, "r", encoding="utf8") as f:
+			index = json.load(f)
+
+		ret = [index_path]
+		for path in index["shards"]:
+			path = os.path.join(locale, path)
+			ret += [path] + [path + "." + format for format in compress]
+		for id in index["cards"]["ids"]:
+			ret.append(os.path.join(locale, index["cards"]["path"].format(id=id)))
+
+		return ret
+
+	def add(self, obj):
+		data = self.encode(obj)
+
+		self.card_ids.append(obj["id"])
+		filename = os.path.join(self.basedir, SHARD_CARD_PATH.format(id=obj["id"]))
+		if len(self.card_ids) == 1:
+			print("Writing shards to %r" % (self.basedir))
+			get_dir(self.basedir, os.path.dirname(SHARD_CARD_PATH))
+		with CompressingWriter(filename) as f:
+			f.write(data)
+
+		for field, dirname in SHARD_FIELDS.items():
+			value = obj.get(field)
+			if not value:
+				continue
+
+			path = "%s/%s.json" % (dirname, value)
+			if path in self.writers:
+				self.writers[path].write(",")
+			else:
+				filename = os.path.join(get_dir(self.basedir, dirname), value + ".json")
+				self.writers[path] = CompressingWriter(filename, self.compress)
+				self.writers[path].write("[")
+				self.shards[path] = []
+
+			self.writers[path].write(data)
+			self.shards[path].append(obj["id"])
+
+	def close(self):
+		for writer in self.writers.values():
+			writer.write("]")
+			writer.close()
+		self.writers = {}
+
+		json_dump({
+			"cards": {"path": SHARD_CARD_PATH, "ids": self.card_ids},
+			"shards": self.shards,
+		}, os.path.join(self.basedir, SHARD_INDEX_FILENAME))
+
+
+def sha1_json(obj):
+	return hashlib.sha1(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class BuildManifest:
+	"""
+	Records a content hash of the inputs of every exported file, so that the
+	next build can reuse the files whose inputs did not change.
+
+	A card's hash covers its locale-invariant skeleton; a file's hash covers the
+	hashes and localized strings of all its cards, the export options and the
+	source of the generator and of the columnar, index and compressing writers.
+	"""
+
+	def __init__(self, output_dir, previous_dir, skeletons, options):
+		self.output_dir = output_dir
+		self.previous_dir = previous_dir or output_dir
+		self.cards = {id: sha1_json(skeleton) for id, skeleton in skeletons.items()}
+		self.files = {}
+
+		# The .columnar, .index.json and compressed files are reused along with the JSON
+		generator_hash = hashlib.sha1()
+		modules = (
+			__file__, inspect.getfile(ColumnarWriter), inspect.getfile(CardIndexWriter),
+			inspect.getfile(CompressingWriter),
+		)
+		for module in modules:
+			with open(module, "rb") as f:
+				generator_hash.update(f.read())
+		self.options_hash = sha1_json([MANIFEST_VERSION, generator_hash.hexdigest(), options])
+
+		self.previous_files = {}
+		previous = self.load(self.previous_dir)
+		if previous.get("version") == MANIFEST_VERSION:
+			self.previous_files = previous.get("files", {})
+			if os.path.samefile(self.previous_dir, output_dir):
+				# Files for locales we don't export this time are still there
+				self.files.update(self.previous_files)
+
+	@staticmethod
+	def load(dirname):
+		path = os.path.join(dirname, MANIFEST_FILENAME)
+		if not os.path.exists(path):
+			return {}
+		with open(path, "r", encoding="utf8") as f:
+			return json.load(f)
+
+	def hash_file(self, cards, locale):
+		ret = hashlib.sha1(self.options_hash.encode("utf-8"))
+		for card in cards:
+			if locale == ALL_LOCALES:
+				strings = serialize_card_all_locales(card, {})
+			else:
+				card.locale = locale
+				strings = serialize_card_strings(card)
+			ret.update(self.cards[card.id].encode("utf-8"))
+			ret.update(json.dumps(strings, sort_keys=True).encode("utf-8"))
+
+		return ret.hexdigest()
+
+	def reuse(self, path, digest, outputs):
+		"""
+		Reuse the previous build's copy of path and of the other outputs
+		generated along with it (all relative to the output directory), if
+		they were generated from the same inputs. Returns whether they were.
+		"""
+		if self.previous_files.get(path) != digest:
+			return False
+
+		filenames = [os.path.join(self.previous_dir, output) for output in outputs]
+		if not all(os.path.exists(filename) for filename in filenames):
+			return False
+
+		print("Reusing %r from %r" % (path, self.previous_dir))
+		if not os.path.samefile(self.previous_dir, self.output_dir):
+			for filename, output in zip(filenames, outputs):
+				link_or_copy(filename, os.path.join(self.output_dir, output))
+
+		return True
+
+	def save(self):
+		json_dump({
+			"version": MANIFEST_VERSION,
+			"cards": self.cards,
+			"files": self.files,
+		}, os.path.join(self.output_dir, MANIFEST_FILENAME))
+
+
+def export_locale(
+	cards, collectible_cards, skeletons, output_dir, locale, compress=(), columnar=False,
+	shards=False, index=False, manifest=None
+):
+	"""
+	Export cards.json and cards.collectible.json for a locale.
+	Returns the input hashes of the exported files, keyed by their path
+	relative to output_dir (empty without a manifest).
+	"""
+	ret = {}
+
+	for basename, locale_cards in (
+		("cards.json", cards),
+		("cards.collectible.json", collectible_cards),
+	):
+		path = os.path.join(locale, basename)
+		columnar_path = os.path.splitext(path)[0] + ".columnar"
+		index_path = get_index_path(path)
+		# Shards are only written for the full card list
+		write_shards = shards and locale_cards is cards
+
+		if manifest:
+			ret[path] = manifest.hash_file(locale_cards, locale)
+			outputs = [path] + [path + "." + format for format in compress]
+			if columnar:
+				outputs.append(columnar_path)
+			if index:
+				outputs.append(index_path)
+			if write_shards:
+				outputs += ShardWriter.list_outputs(manifest.previous_dir, locale, compress)
+			if manifest.reuse(path, ret[path], outputs):
+				continue
+
+		sinks = []
+		if columnar:
+			sinks.append(ColumnarWriter(os.path.join(output_dir, columnar_path), ENUM_FIELDS))
+		if write_shards:
+			sinks.append(ShardWriter(os.path.join(output_dir, locale), compress))
+
+		filename = os.path.join(output_dir, path)
+		index_writer = None
+		if index:
+			index_writer = CardIndexWriter(os.path.join(output_dir, index_path), filename)
+
+		if locale == ALL_LOCALES:
+			export_all_locales_cards_to_file(
+				locale_cards, filename, skeletons, compress, sinks, index_writer
+			)
+		else:
+			export_cards_to_file(
+				locale_cards, filename, locale, skeletons, compress, sinks, index_writer
+			)
+
+	return ret
+
+
+def _export_locale_worker(locale):
+	# The log is printed by the parent so that lines from workers don't interleave
+	with redirect_stdout(io.StringIO()) as log:
+		ret = export_locale(locale=locale, **_export_state)
+	return locale, ret, log.getvalue()
+
+
+def export_cards(
+	db, output_dir, locales, jobs=1, compress=(), columnar=False, shards=False, index=False,
+	incremental=False, previous_dir=None
+):
+	"""
+	Export the cards in db for each locale in locales (which may include
+	ALL_LOCALES). With jobs > 1, locales are exported in a pool of forked
+	processes sharing the already-loaded card database.
+
+	With columnar, a columnar copy of each file is written alongside it (see
+	columnar.py).
+
+	With shards, each locale's cards are also split per set, per class and
+	per card, see ShardWriter.
+
+	With index, a sidecar index of the byte range of every card is written
+	alongside each file (see cardindex.py).
+
+	With incremental, a build manifest is written to output_dir, and files
+	whose inputs match the manifest in previous_dir (or in output_dir itself)
+	are reused instead of being regenerated.
+	"""
+	cards = list(db.values())
+	collectible_cards = [card for card in cards if card.collectible]
+
+	# The locale-invariant part of each card is serialized only once and shared
+	# between every locale (and the collectible subset).
+	skeletons = serialize_skeletons(cards)
+
+	for locale in locales:
+		get_dir(output_dir, locale)
+
+	manifest = None
+	if incremental:
+		options = {
+			"compress": sorted(compress), "columnar": columnar, "shards": shards, "index": index,
+		}
+		manifest = BuildManifest(output_dir, previous_dir, skeletons, options)
+
+	state = {
+		"cards": cards,
+		"collectible_cards": collectible_cards,
+		"skeletons": skeletons,
+		"output_dir": output_dir,
+		"compress": compress,
+		"columnar": columnar,
+		"shards": shards,
+		"index": index,
+		"manifest": manifest,
 	}
-	ret = []
 
-	for card in cards:
-		obj = serialize_card(card)
-		obj["collectionText"] = {}
-		for tag, key in tag_names.items():
-			value = card.strings.get(tag, {})
-			if key == "text":
-				for locale, localized_value in value.items():
-					text, collection_text = clean_card_description(localized_value, card)
-					value[locale] = text
-					if collection_text:
-						obj["collectionText"][locale] = collection_text
-			if value:
-				obj[key] = value
+	if jobs <= 1 or len(locales) <= 1:
+		results = [(locale, export_locale(locale=locale, **state)) for locale in locales]
+	else:
+		# The merged export is by far the largest, start it first.
+		locales = sorted(locales, key=lambda locale: locale != ALL_LOCALES)
+
+		results = []
+		_export_state.update(state)
+		try:
+			context = multiprocessing.get_context("fork")
+			with context.Pool(min(jobs, len(locales))) as pool:
+				for locale, hashes, log in pool.imap_unordered(_export_locale_worker, locales):
+					sys.stdout.write(log)
+					print("Exported %r" % (locale))
+					results.append((locale, hashes))
+		finally:
+			_export_state.clear()
+
+	if manifest:
+		for locale, hashes in results:
+			manifest.files.update(hashes)
+		manifest.save()
+
+
+def iter_carddefs(path, locale="enUS"):
+	"""
+	Yield the cards of a CardDefs.xml one at a time.
+	Each Entity element is discarded once converted, so the document is never
+	held in memory as a whole (unlike hearthstone.cardxml.load).
+	"""
+	root = None
+	for event, elem in ElementTree.iterparse(path, events=("start", "end")):
+		if root is None:
+			root = elem
+		elif event == "end" and elem.tag == "Entity":
+			card = CardXML.from_xml(elem)
+			card.locale = locale
+			# from_xml keeps the MasterPower element, which would keep the tree alive
+			if card.master_power is not None:
+				card.master_power = card.master_power.text
+			elem.clear()
+			root.remove(elem)
+			yield card
+
+
+def load_cards(path, locale="enUS"):
+	return {card.id: card for card in iter_carddefs(path, locale)}
+
+
+def get_locales(filter_locales=None):
+	"""
+	Return the locales to export: every used locale and ALL_LOCALES, or only
+	those in filter_locales (case-insensitive).
+	"""
+	filter_locales = [loc.lower() for loc in filter_locales or []]
+	locales = []
 
-		if not obj["collectionText"]:
-			del obj["collectionText"]
+	for locale in Locale:
+		if locale.unused:
+			continue
 
-		ret.append(obj)
+		if filter_locales and locale.name.lower() not in filter_locales:
+			continue
 
-	json_dump(ret, filename)
+		locales.append(locale.name)
+
+	# Generate merged locales
+	if ALL_LOCALES in filter_locales or not filter_locales:
+		locales.append(ALL_LOCALES)
+
+	return locales
 
 
 def main():
@@ -279,41 +808,60 @@ def main():
 		help="Input hsdata directory"
 	)
 	parser.add_argument("--locale", type=str, nargs="*", help="Only generate one locale")
+	parser.add_argument(
+		"-j", "--jobs",
+		type=int,
+		default=1,
+		help="Number of locales to export in parallel"
+	)
+	parser.add_argument(
+		"--compress",
+		nargs="*",
+		choices=COMPRESSION_FORMATS,
+		default=[],
+		help="Also write precompressed variants of every JSON file"
+	)
+	parser.add_argument(
+		"--columnar",
+		action="store_true",
+		help="Also write a compact columnar copy of every cards file"
+	)
+	parser.add_argument(
+		"--shards",
+		action="store_true",
+		help="Also split cards.json per set, per class and per card"
+	)
+	parser.add_argument(
+		"--index",
+		action="store_true",
+		help="Also write a sidecar index of the byte range of each card"
+	)
+	parser.add_argument(
+		"--incremental",
+		action="store_true",
+		help="Write a build manifest and only regenerate files whose inputs changed"
+	)
+	parser.add_argument(
+		"--previous-dir",
+		type=str,
+		help="Output directory of a previous build to reuse unchanged files from"
+	)
 	args = parser.parse_args(sys.argv[1:])
 
-	db, xml = load(os.path.join(args.input_dir, "CardDefs.xml"))
-
-	cards = db.values()
-	collectible_cards = [card for card in cards if card.collectible]
-
-	filter_locales = [loc.lower() for loc in args.locale or []]
-
-	for locale in Locale:
-		if locale.unused:
-			continue
-
-		if filter_locales and locale.name.lower() not in filter_locales:
-			continue
-
-		basedir = os.path.join(args.output_dir, locale.name)
-		if not os.path.exists(basedir):
-			os.makedirs(basedir)
-
-		filename = os.path.join(basedir, "cards.json")
-		export_cards_to_file(cards, filename, locale.name)
-
-		filename = os.path.join(basedir, "cards.collectible.json")
-		export_cards_to_file(collectible_cards, filename, locale.name)
-
-	# Generate merged locales
-	if "all" in filter_locales or not filter_locales:
-		basedir = os.path.join(args.output_dir, "all")
-		if not os.path.exists(basedir):
-			os.makedirs(basedir)
-		filename = os.path.join(basedir, "cards.json")
-		export_all_locales_cards_to_file(cards, filename)
-		filename = os.path.join(basedir, "cards.collectible.json")
-		export_all_locales_cards_to_file(collectible_cards, filename)
+	db = load_cards(os.path.join(args.input_dir, "CardDefs.xml"))
+
+	export_cards(
+		db,
+		args.output_dir,
+		get_locales(args.locale),
+		jobs=args.jobs,
+		compress=args.compress,
+		columnar=args.columnar,
+		shards=args.shards,
+		index=args.index,
+		incremental=args.incremental or bool(args.previous_dir),
+		previous_dir=args.previous_dir,
+	)
 
 
 if __name__ == "__main__":
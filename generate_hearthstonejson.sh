@@ -6,6 +6,8 @@ BUILDDIR="$BASEDIR/build"
 HTMLDIR="$BUILDDIR/html"
 OUTDIR="$HTMLDIR/v1"
 PYTHON=${PYTHON:-python}
+JOBS=${JOBS:-$(nproc)}
+COMPRESS="gz br"
 GENERATE_STRINGS_BIN="$BASEDIR/generate_strings.py"
 GENERATE_BIN="$BASEDIR/generate_hearthstonejson.py"
 S3_UPLOAD_BIN="$BASEDIR/s3_upload.py"
@@ -40,14 +42,17 @@ function update_enums() {
 }
 
 function update_strings() {
-	"$PYTHON" "$GENERATE_STRINGS_BIN" -o "$OUTDIR/strings"
+	"$PYTHON" "$GENERATE_STRINGS_BIN" -o "$OUTDIR/strings" --compress $COMPRESS
 }
 
 function update_build() {
 	build="$1"
 	git -C "$HSDATA_DIR" reset --hard "$build"
 	mkdir -p "$OUTDIR"
-	"$PYTHON" "$GENERATE_BIN" --input-dir="$HSDATA_DIR" --output-dir="$OUTDIR/$build"
+	# Reuse unchanged files from the closest previous build
+	previous="$(ls "$OUTDIR" | grep -E '^[0-9]+$' | sort -n | awk -v b="$build" '$1 < b' | tail -n1)"
+	"$PYTHON" "$GENERATE_BIN" --input-dir="$HSDATA_DIR" --output-dir="$OUTDIR/$build" --jobs="$JOBS" \
+		--compress $COMPRESS --incremental ${previous:+--previous-dir="$OUTDIR/$previous"}
 }
 
 function update_indexes() {
@@ -67,7 +72,13 @@ function update_indexes() {
 function upload_to_s3() {
 	build="$1"
 
-	aws s3 sync "$OUTDIR" "s3://$S3_BUCKET_NAME/v1"
+	aws s3 sync "$OUTDIR" "s3://$S3_BUCKET_NAME/v1" --exclude "*.gz" --exclude "*.br" \
+		--exclude "*/build-manifest.json"
+	# Precompressed variants are served as-is with the matching Content-Encoding
+	aws s3 sync "$OUTDIR" "s3://$S3_BUCKET_NAME/v1" --exclude "*" --include "*.json.gz" \
+		--content-type "application/json" --content-encoding "gzip"
+	aws s3 sync "$OUTDIR" "s3://$S3_BUCKET_NAME/v1" --exclude "*" --include "*.json.br" \
+		--content-type "application/json" --content-encoding "br"
 	"$PYTHON" "$S3_UPLOAD_BIN" --build="$build" "$OUTDIR"
 }
 
@@ -95,10 +106,15 @@ elif [[ $1 == "clean-upload" ]]; then
 elif [[ $1 == "sync-textures" ]]; then
 	echo "Syncing textures to S3"
 	if [[ -z $2 ]]; then
-		>&2 echo "Usage: $0 $1 <input dir>"
+		>&2 echo "Usage: $0 $1 <input dir> [changed list]"
 		exit 2
 	fi
-	aws s3 sync "$2" "s3://$S3_ART_BUCKET_NAME/v1"
+	if [[ -n $3 ]]; then
+		# Only the files listed by generate_card_textures.py --changed-list
+		"$PYTHON" "$S3_UPLOAD_BIN" --upload-list "$3" --bucket "$S3_ART_BUCKET_NAME" --prefix "v1/" "$2"
+	else
+		aws s3 sync "$2" "s3://$S3_ART_BUCKET_NAME/v1" --exclude "texture-manifest.json"
+	fi
 elif [[ $1 == "all" ]]; then
 	echo "Updating all builds"
 	for build in ${builds[@]}; do
@@ -8,6 +8,8 @@ from hearthstone.enums import Locale
 from hearthstone.stringsfile import load
 from hearthstone_data import get_strings_file
 
+from compressingwriter import COMPRESSION_FORMATS, CompressingWriter
+
 
 FILENAMES = [
 	"GAMEPLAY_AUDIO.txt",
@@ -34,6 +36,13 @@ def main():
 		default="out",
 		help="Output directory"
 	)
+	parser.add_argument(
+		"--compress",
+		nargs="*",
+		choices=COMPRESSION_FORMATS,
+		default=[],
+		help="Also write precompressed variants of every JSON file"
+	)
 	args = parser.parse_args(sys.argv[1:])
 
 	for locale in Locale:
@@ -50,7 +59,7 @@ def main():
 				strings_data = convert_strings_data(load(f))
 
 			output_filename = os.path.join(basedir, filename.replace(".txt", ".json"))
-			with open(output_filename, "w") as f:
+			with CompressingWriter(output_filename, args.compress) as f:
 				json.dump(strings_data, f)
 
 
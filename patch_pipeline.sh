@@ -27,6 +27,9 @@ HSPROTO_GIT="$BASEDIR/hsproto.git"
 # Directory that contains card textures
 CARDARTDIR="$BUILDDIR/card-art"
 
+# Card textures rendered by the last extraction, to upload
+CARDART_CHANGED="$BUILDDIR/card-art-changed.txt"
+
 # HearthstoneJSON file generator
 HEARTHSTONEJSON_BIN="$BASEDIR/generate_hearthstonejson.sh"
 
@@ -234,8 +237,9 @@ function update_hearthstonejson() {
 
 function extract_card_textures() {
 	echo "Extracting card textures"
-	"$TEXTUREGEN_BIN" "$HSBUILDDIR/Data/Win/"{rad_base,card,premiummaterials,shared}*.unity3d --outdir="$CARDARTDIR" --skip-existing
-	"$HEARTHSTONEJSON_BIN" sync-textures "$CARDARTDIR"
+	"$TEXTUREGEN_BIN" "$HSBUILDDIR/Data/Win/"{rad_base,card,premiummaterials,shared}*.unity3d --outdir="$CARDARTDIR" \
+		--incremental --changed-list="$CARDART_CHANGED"
+	"$HEARTHSTONEJSON_BIN" sync-textures "$CARDARTDIR" "$CARDART_CHANGED"
 }
 
 
@@ -0,0 +1,151 @@
+"""
+Wall time, CPU time and peak memory of the phases of a run, written as a
+JSON report and/or a Chrome trace (chrome://tracing, https://ui.perfetto.dev).
+
+Peak memory is per phase where the kernel allows resetting it (Linux); on
+other systems it is the peak of the process so far.
+"""
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+
+
+def get_peak_rss_kb():
+	# VmHWM can be reset per process (see reset_peak_rss), ru_maxrss can't
+	try:
+		with open("/proc/self/status") as f:
+			for line in f:
+				if line.startswith("VmHWM:"):
+					return int(line.split()[1])
+	except OSError:
+		pass
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def reset_peak_rss():
+	try:
+		with open("/proc/self/clear_refs", "w") as f:
+			f.write("5")
+	except OSError:
+		pass
+
+
+class _NullPhase:
+	def __enter__(self):
+		pass
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		pass
+
+
+class NullProfiler:
+	"""
+	Drop-in for PhaseProfiler when profiling is off.
+	"""
+	enabled = False
+	_phase = _NullPhase()
+
+	def phase(self, name, **args):
+		return self._phase
+
+
+class PhaseProfiler:
+	enabled = True
+
+	def __init__(self):
+		self.start = time.perf_counter()
+		self.phases = []
+		self._stack = []
+
+	@contextmanager
+	def phase(self, name, **args):
+		"""
+		Record the block as a phase. Phases may be nested; the peak memory of
+		a phase includes that of the phases it contains.
+		"""
+		peak_rss = get_peak_rss_kb()
+		for parent in self._stack:
+			parent["peak_rss_kb"] = max(parent["peak_rss_kb"], peak_rss)
+		reset_peak_rss()
+
+		phase = {
+			"name": name,
+			"pid": os.getpid(),
+			"start": time.perf_counter(),
+			"peak_rss_kb": 0,
+			"args": args,
+		}
+		self._stack.append(phase)
+		start_cpu = time.process_time()
+		try:
+			yield
+		finally:
+			phase["seconds"] = time.perf_counter() - phase["start"]
+			phase["cpu_seconds"] = time.process_time() - start_cpu
+			phase["peak_rss_kb"] = max(phase["peak_rss_kb"], get_peak_rss_kb())
+			self._stack.pop()
+			if self._stack:
+				self._stack[-1]["peak_rss_kb"] = max(
+					self._stack[-1]["peak_rss_kb"], phase["peak_rss_kb"]
+				)
+			self.phases.append(phase)
+
+	def extend(self, phases):
+		"""
+		Add phases recorded by another process (see call_profiled).
+		"""
+		self.phases += phases
+
+	def get_report(self):
+		usage = resource.getrusage(resource.RUSAGE_SELF)
+		children = resource.getrusage(resource.RUSAGE_CHILDREN)
+		phases = []
+		for phase in sorted(self.phases, key=lambda phase: phase["start"]):
+			phase = dict(phase)
+			# perf_counter is system-wide, so worker phases share the timeline
+			phase["start"] -= self.start
+			phases.append(phase)
+
+		return {
+			"seconds": time.perf_counter() - self.start,
+			"cpu_seconds": usage.ru_utime + usage.ru_stime,
+			"children_cpu_seconds": children.ru_utime + children.ru_stime,
+			"peak_rss_kb": usage.ru_maxrss,
+			"children_peak_rss_kb": children.ru_maxrss,
+			"phases": phases,
+		}
+
+	def write_report(self, filename):
+		with open(filename, "w") as f:
+			json.dump(self.get_report(), f, indent="\t", sort_keys=True)
+
+	def write_trace(self, filename):
+		events = []
+		for phase in self.get_report()["phases"]:
+			args = dict(phase["args"])
+			args.update(cpu_seconds=phase["cpu_seconds"], peak_rss_kb=phase["peak_rss_kb"])
+			events.append({
+				"name": phase["name"],
+				"ph": "X",
+				"ts": phase["start"] * 1e6,
+				"dur": phase["seconds"] * 1e6,
+				"pid": phase["pid"],
+				"tid": phase["pid"],
+				"args": args,
+			})
+
+		with open(filename, "w") as f:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def call_profiled(name, args, func, *func_args):
+	"""
+	Call func(*func_args) as a phase of a new profiler, eg. in a worker
+	process. Returns (result, phases) for PhaseProfiler.extend().
+	"""
+	profiler = PhaseProfiler()
+	with profiler.phase(name, **args):
+		ret = func(*func_args)
+	return ret, profiler.phases
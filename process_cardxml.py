@@ -1,17 +1,29 @@
 #!/usr/bin/env python
 
 import csv
+import hashlib
+import inspect
+import io
+import multiprocessing
 import os
+import pickle
 import re
+import shutil
 import sys
+import time
 import unitypack
 from argparse import ArgumentParser, FileType
-from xml.dom import minidom
+from contextlib import redirect_stdout
+from functools import partial
 from lxml import etree as ElementTree
 from hearthstone import cardxml
-from hearthstone.dbf import Dbf
 from hearthstone.enums import GameTag, Locale
 
+from carddb import write_card_db
+from dbfreader import iter_dbf_records
+from generate_hearthstonejson import export_cards, get_locales
+from phaseprofiler import NullProfiler, PhaseProfiler, call_profiled
+
 
 MISSING_HERO_POWERS = {
 	"BRM_027h": 2319,  # "BRM_027p"
@@ -21,12 +33,127 @@ MISSING_HERO_POWERS = {
 IGNORE_LOCALES = ("enGB", "ptPT")
 
 SPARE_PART_RE = re.compile(r"PART_\d+")
+OVERLOAD_RE = re.compile(r"Overload[^(]+\((\d+)\)")
+SPELLPOWER_RE = re.compile(r"Spell (?:Power|Damage)(?:</b>)? \+(\d+)")
+
+
+def _escape_xml(data):
+	# Same escaping as xml.dom.minidom, for both text and attribute values
+	data = data.replace("&", "&amp;").replace("<", "&lt;")
+	return data.replace('"', "&quot;").replace(">", "&gt;")
+
+
+def _iter_pretty_element(elem, indent, addindent="\t"):
+	# Same output as minidom's Element.writexml(writer, indent, addindent, "\n")
+	yield indent + "<" + elem.tag
+	for name, value in elem.attrib.items():
+		yield ' %s="%s"' % (name, _escape_xml(value))
+
+	nodes = [elem.text] if elem.text else []
+	for child in elem:
+		nodes.append(child)
+		if child.tail:
+			nodes.append(child.tail)
+
+	if not nodes:
+		yield "/>\n"
+	elif len(nodes) == 1 and isinstance(nodes[0], str):
+		yield ">%s</%s>\n" % (_escape_xml(nodes[0]), elem.tag)
+	else:
+		yield ">\n"
+		for node in nodes:
+			if isinstance(node, str):
+				yield _escape_xml(indent + addindent + node + "\n")
+			else:
+				yield from _iter_pretty_element(node, indent + addindent, addindent)
+		yield indent + "</%s>\n" % (elem.tag)
+
+
+def write_pretty_xml(f, root, children):
+	"""
+	Write root, with the elements of the iterable children as its children,
+	indented to the binary file f.
+	The output is identical to pretty_xml() of the whole tree, but only one
+	child is held in memory at a time.
+	"""
+	def write_lines(s):
+		# Like toprettyxml() followed by removing blank lines
+		for line in s.encode("utf-8", "xmlcharrefreplace").split(b"\n"):
+			if line.strip():
+				f.write(b"\n" + line)
+
+	f.write(b'<?xml version="1.0" encoding="utf-8"?>')
+	head = "".join(_iter_pretty_element(root, ""))
+
+	empty = True
+	for child in children:
+		if empty:
+			# Open the root element
+			write_lines(head[:-len("/>\n")] + ">\n")
+			empty = False
+		write_lines("".join(_iter_pretty_element(child, "\t")))
+
+	if empty:
+		write_lines(head)
+	else:
+		write_lines("</%s>\n" % (root.tag))
 
 
 def pretty_xml(xml):
-	ret = ElementTree.tostring(xml, encoding="utf-8")
-	ret = minidom.parseString(ret).toprettyxml(indent="\t", encoding="utf-8")
-	return b"\n".join(line for line in ret.split(b"\n") if line.strip())
+	ret = io.BytesIO()
+	write_pretty_xml(ret, ElementTree.Element(xml.tag, xml.attrib), xml)
+	return ret.getvalue()
+
+
+def _normalize_xml_text(text):
+	# The text as read back from write_pretty_xml()'s output: whitespace-only
+	# lines are dropped, and the parser normalizes line endings to "\n".
+	lines = text.split("\n")
+	if len(lines) > 2:
+		lines = lines[:1] + [line for line in lines[1:-1] if line.strip(" \t\r\x0b\x0c")] + lines[-1:]
+	return "\n".join(lines).replace("\r\n", "\n").replace("\r", "\n")
+
+
+def entity_to_card(entity, locale="enUS"):
+	"""
+	Return a copy of entity as generate_hearthstonejson.load_cards() would
+	read it from the CardDefs.xml written by generate_xml(), without writing
+	or parsing the document.
+	"""
+	xml = entity.to_xml()
+	for elem in xml.iter():
+		if elem.text:
+			elem.text = _normalize_xml_text(elem.text)
+
+	card = cardxml.CardXML.from_xml(xml)
+	card.locale = locale
+	if card.master_power is not None:
+		card.master_power = card.master_power.text
+	return card
+
+
+_gametags = {}
+
+
+def get_gametag(enum_id):
+	# Tags are looked up for every entity of every locale, so resolve each enumID once
+	ret = _gametags.get(enum_id)
+	if ret is None:
+		ret = _gametags[enum_id] = GameTag(int(enum_id))
+	return ret
+
+
+def iter_carddefs_entities(source):
+	"""
+	Yield the Entity elements of a full CardDefs document while parsing it.
+	Each element is freed once the next one is requested, so the document is
+	never fully materialized.
+	"""
+	for event, elem in ElementTree.iterparse(source, events=("end", ), tag="Entity"):
+		yield elem
+		elem.clear()
+		while elem.getprevious() is not None:
+			del elem.getparent()[0]
 
 
 def string_to_bool(s):
@@ -67,20 +194,420 @@ def detect_build(path):
 	return int(path_fragments[0])
 
 
+# Where game installs keep their bundles and DBFs, relative to the install
+AUTODETECT_PROBE_DIRS = ("", os.path.join("Data", "Win"), "Hearthstone_Data")
+
+
+def _iter_dir(path):
+	try:
+		with os.scandir(path) as it:
+			yield from it
+	except (FileNotFoundError, NotADirectoryError):
+		pass
+
+
+def _match_entry(entry, filenames, dirnames):
+	if entry.name in filenames:
+		return entry.is_file()
+	if entry.name in dirnames:
+		return entry.is_dir()
+	return False
+
+
+def probe_game_files(dirname, filenames, dirnames, probes=AUTODETECT_PROBE_DIRS):
+	"""
+	Return the (name, path) of the files in filenames and the directories in
+	dirnames found directly in the known locations of a game install.
+	"""
+	ret = []
+	for probe in probes:
+		for entry in _iter_dir(os.path.join(dirname, probe)):
+			if _match_entry(entry, filenames, dirnames):
+				ret.append((entry.name, entry.path))
+	return ret
+
+
+def walk_game_files(dirname, filenames, dirnames, is_complete=None):
+	"""
+	Like probe_game_files(), looking through the whole tree, breadth first.
+	Matched directories are not descended into. The walk stops after the
+	level where is_complete(names) is first true for the set of names found
+	so far (by default, once every name has been found).
+	"""
+	if is_complete is None:
+		def is_complete(names):
+			return names >= set(filenames) | set(dirnames)
+
+	ret = []
+	names = set()
+	queue = [dirname]
+	while queue and not is_complete(names):
+		subdirs = []
+		for path in queue:
+			for entry in _iter_dir(path):
+				if _match_entry(entry, filenames, dirnames):
+					ret.append((entry.name, entry.path))
+					names.add(entry.name)
+				elif entry.is_dir(follow_symlinks=False):
+					subdirs.append(entry.path)
+		queue = subdirs
+	return ret
+
+
 def guess_overload(text):
-	sre = re.search(r"Overload[^(]+\((\d+)\)", text)
+	sre = OVERLOAD_RE.search(text)
 	if sre is None:
 		return 0
 	return int(sre.groups()[0])
 
 
 def guess_spellpower(text):
-	sre = re.search(r"Spell (?:Power|Damage)(?:</b>)? \+(\d+)", text)
+	sre = SPELLPOWER_RE.search(text)
 	if sre is None:
 		return 0
 	return int(sre.groups()[0])
 
 
+class TextRule:
+	"""
+	A heuristic setting tags on an entity from its description (or its id).
+
+	The rule is tried on entities for which condition(entity) is true (all of
+	them without a condition), and only if the text contains one of the
+	prefilter strings. If the rule has a pattern, it must also match the text.
+	action(entity, match) then sets the tags and returns whether it succeeded.
+	A rule with a warning warns when it is tried but doesn't succeed.
+	Rules only apply to builds in [min_build, max_build).
+	"""
+
+	def __init__(
+		self, name, action, prefilter, pattern=None, source="description", condition=None,
+		warning=None, min_build=None, max_build=None
+	):
+		self.name = name
+		self.action = action
+		self.prefilter = (prefilter, ) if isinstance(prefilter, str) else tuple(prefilter)
+		self.pattern = re.compile(pattern) if isinstance(pattern, str) else pattern
+		self.source = source
+		self.condition = condition
+		self.warning = warning
+		self.min_build = min_build
+		self.max_build = max_build
+
+	def applies_to_build(self, build):
+		if self.min_build is not None and build < self.min_build:
+			return False
+		if self.max_build is not None and build >= self.max_build:
+			return False
+		return True
+
+	def match(self, text):
+		if not any(s in text for s in self.prefilter):
+			return None
+		if self.pattern is None:
+			return True
+		return self.pattern.match(text) if self.source == "id" else self.pattern.search(text)
+
+
+def _has_overload(entity):
+	if not entity.overload:
+		return False
+	assert entity.overload == 1
+	return True
+
+
+def _has_spellpower(entity):
+	if not entity.spell_damage:
+		return False
+	assert entity.spell_damage == 1
+	return True
+
+
+def _set_overload(entity, match):
+	overload = int(match.group(1))
+	if overload:
+		entity.tags[GameTag.OVERLOAD] = overload
+	return bool(overload)
+
+
+def _set_spellpower(entity, match):
+	sp = int(match.group(1))
+	if sp:
+		entity.tags[GameTag.SPELLPOWER] = sp
+	return bool(sp)
+
+
+def _set_tags(*tags):
+	def action(entity, match):
+		for tag in tags:
+			entity.tags[tag] = True
+		return True
+	return action
+
+
+TEXT_RULES = [
+	# Parse the exact overload amount
+	TextRule(
+		"overload", _set_overload, "Overload", OVERLOAD_RE,
+		condition=_has_overload,
+		warning="Could not guess overload for %r: %r",
+	),
+	# Parse the exact spellpower amount
+	TextRule(
+		"spellpower", _set_spellpower, "Spell ", SPELLPOWER_RE,
+		condition=_has_spellpower,
+		warning="Could not guess spell power for %r: %r",
+	),
+	# Set the "shrouded" tags if available
+	TextRule(
+		"shrouded", _set_tags(
+			GameTag.CANT_BE_TARGETED_BY_SPELLS, GameTag.CANT_BE_TARGETED_BY_HERO_POWERS
+		), "Can't be targeted by Spells or Hero Powers.", max_build=6024,
+	),
+	TextRule(
+		"shrouded", _set_tags(
+			GameTag.CANT_BE_TARGETED_BY_SPELLS, GameTag.CANT_BE_TARGETED_BY_HERO_POWERS
+		), "Can't be targeted by spells or Hero Powers.", min_build=6024,
+	),
+	# Set the CANT_ATTACK tag if available
+	TextRule("cant_attack", _set_tags(GameTag.CANT_ATTACK), ("Can't attack.", "Can't Attack.")),
+	# Mark all spare parts with the SPARE_PART tag
+	TextRule("spare_part", _set_tags(GameTag.SPARE_PART), "PART_", SPARE_PART_RE, source="id"),
+]
+
+
+class TextRuleEngine:
+	"""
+	Applies the rules for a build, counting how many entities each rule was
+	tried on and matched, and the time spent in it.
+	"""
+
+	def __init__(self, rules, build):
+		self.rules = [rule for rule in rules if rule.applies_to_build(build)]
+		self.stats = {
+			rule.name: {"tried": 0, "matched": 0, "seconds": 0.0} for rule in self.rules
+		}
+
+	def apply(self, entity, warn):
+		texts = {"description": entity.description, "id": entity.id}
+
+		for rule in self.rules:
+			start = time.perf_counter()
+			stats = self.stats[rule.name]
+
+			if rule.condition is None or rule.condition(entity):
+				stats["tried"] += 1
+				text = texts[rule.source]
+				match = rule.match(text)
+				if match and rule.action(entity, match):
+					stats["matched"] += 1
+				elif rule.warning:
+					warn(rule.warning % (entity, text))
+
+			stats["seconds"] += time.perf_counter() - start
+
+	def report(self):
+		for name, stats in self.stats.items():
+			yield "Rule %r: tried %i, matched %i, %.3fs" % (
+				name, stats["tried"], stats["matched"], stats["seconds"]
+			)
+
+
+# The DBFs of dbf.unity3d used by parse_dbf_unity_data
+UNITY_DBF_NAMES = ("CARD", "CARD_TAG", "CARD_SET_TIMING")
+
+
+def read_dbf_unity_asset(asset):
+	ret = {}
+
+	for obj in asset.objects.values():
+		d = obj.read()
+		if "Records" in d and "m_Name" in d:
+			name = d["m_Name"]
+			records = d["Records"]
+			if name in UNITY_DBF_NAMES:
+				ret[name] = records
+
+	return ret
+
+
+def read_bundle(path):
+	"""
+	Decode a Unity bundle into plain data, so that bundles can be decoded in
+	worker processes. Returns (asset name, kind, data) where either:
+	- kind is "dbf" and data is a dict of DBF name -> records
+	- kind is "xml" and data is a list of (TextAsset name, script)
+	"""
+	with open(path, "rb") as f:
+		bundle = unitypack.load(f)
+		asset = bundle.assets[0]
+
+		if os.path.basename(path) == "dbf.unity3d":
+			return repr(asset), "dbf", read_dbf_unity_asset(asset)
+
+		text_assets = []
+		for obj in asset.objects.values():
+			if obj.type == "TextAsset":
+				d = obj.read()
+				if d.name in IGNORE_LOCALES:
+					continue
+				text_assets.append((d.name, d.script))
+
+		return repr(asset), "xml", text_assets
+
+
+def read_card_dbf(path):
+	"""
+	Yield the records of CARD.xml as tuples of
+	(id, card_id, long_guid, hero_power_id, artist, {tag: localized strings}),
+	the strings being None for DBFs without localized columns.
+	"""
+	columns = {}
+	for record in iter_dbf_records(path, columns):
+		strings = None
+		# Whether we'll set the CARD_TAG dbf-style (post-15590) string tags
+		if "NAME" in columns:
+			strings = {
+				tag: record.get(column) or {}
+				for tag, column, _ in CardXMLProcessor.tag_dbf_localized_columns
+			}
+
+		yield (
+			record["ID"],
+			record["NOTE_MINI_GUID"],
+			record.get("LONG_GUID", ""),
+			record.get("HERO_POWER_ID"),
+			record.get("ARTIST_NAME", "") or "",
+			strings,
+		)
+
+
+def read_card_tag_dbf(path):
+	"""
+	Yield the records of CARD_TAG.xml as tuples of
+	(dbf_id, tag, value, is_reference, is_power).
+	"""
+	for record in iter_dbf_records(path):
+		yield (
+			record["CARD_ID"],
+			record["TAG_ID"],
+			record["TAG_VALUE"],
+			record["IS_REFERENCE_TAG"],
+			record["IS_POWER_KEYWORD_TAG"],
+		)
+
+
+class DecodeCache:
+	"""
+	On-disk cache of the data decoded from input files (see read_file).
+	Entries are named after the content hash of the file they were decoded
+	from and the source hash of the decoder's module. The file hash itself is
+	remembered per path, size and mtime so that unchanged files are not hashed
+	again.
+	"""
+
+	# Increment when the format of the decoded data changes
+	VERSION = 2
+
+	def __init__(self, dirname):
+		self.dirname = dirname
+		self.source_hashes = {}
+
+	def clear(self):
+		if os.path.exists(self.dirname):
+			shutil.rmtree(self.dirname)
+
+	def _write(self, filename, data):
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+		# Write to a temporary file first, entries may be written by several processes
+		tmp = "%s.%i.tmp" % (filename, os.getpid())
+		with open(tmp, "wb") as f:
+			f.write(data)
+		os.replace(tmp, filename)
+
+	def get_content_hash(self, path):
+		st = os.stat(path)
+		key = "%s\0%i\0%i" % (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+		filename = os.path.join(
+			self.dirname, "stat", hashlib.sha1(key.encode("utf-8")).hexdigest()
+		)
+		if os.path.exists(filename):
+			with open(filename, "r") as f:
+				return f.read()
+
+		sha1 = hashlib.sha1()
+		with open(path, "rb") as f:
+			for chunk in iter(partial(f.read, 1024 * 1024), b""):
+				sha1.update(chunk)
+		ret = sha1.hexdigest()
+		self._write(filename, ret.encode("ascii"))
+
+		return ret
+
+	def get_source_hash(self, func):
+		# A change to the decoder (or to its module) invalidates its entries
+		module = inspect.getfile(func)
+		if module not in self.source_hashes:
+			with open(module, "rb") as f:
+				self.source_hashes[module] = hashlib.sha1(f.read()).hexdigest()
+		return self.source_hashes[module]
+
+	def load(self, path, func):
+		"""
+		Return func(path), from the cache if the same content was already
+		decoded by func.
+		The items of generator functions are cached and returned as a stream.
+		"""
+		filename = os.path.join(
+			self.dirname, "v%i" % (self.VERSION),
+			"%s-%s-%s.pickle" % (func.__name__, self.get_source_hash(func)[:12], self.get_content_hash(path))
+		)
+		if inspect.isgeneratorfunction(func):
+			return self._load_iter(filename, path, func)
+
+		if os.path.exists(filename):
+			with open(filename, "rb") as f:
+				return pickle.load(f)
+
+		ret = func(path)
+		self._write(filename, pickle.dumps(ret, pickle.HIGHEST_PROTOCOL))
+		return ret
+
+	def _load_iter(self, filename, path, func):
+		# Items are pickled one after the other so that they can be streamed
+		if os.path.exists(filename):
+			with open(filename, "rb") as f:
+				while True:
+					try:
+						yield pickle.load(f)
+					except EOFError:
+						return
+
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+		tmp = "%s.%i.tmp" % (filename, os.getpid())
+		try:
+			with open(tmp, "wb") as f:
+				for item in func(path):
+					pickle.dump(item, f, pickle.HIGHEST_PROTOCOL)
+					yield item
+		except BaseException:
+			# Not consumed to the end: the entry would be incomplete
+			os.remove(tmp)
+			raise
+		os.replace(tmp, filename)
+
+
+def read_file(path, func, cache=None):
+	if cache is None:
+		return func(path)
+	return cache.load(path, func)
+
+
+def _read_bundle_profiled(path, cache=None):
+	name = "decode %s" % (os.path.basename(path))
+	return call_profiled(name, {"path": path}, read_file, path, read_bundle, cache)
+
+
 def unity_dbf_locale_to_dict(data):
 	locales = data.get("m_locales", [])
 	locvalues = data.get("m_locValues", [])
@@ -121,6 +648,38 @@ class CardXMLProcessor:
 		self._p.add_argument("--dbf-dir", nargs="?", type=str)
 		self._p.add_argument("--manifest-csv", nargs="?", type=str)
 		self._p.add_argument("--raw", action="store_true")
+		self._p.add_argument(
+			"-j", "--jobs", type=int, default=1,
+			help="Number of processes to decode bundles and export locales with"
+		)
+		self._p.add_argument(
+			"--cache-dir", type=str,
+			help="Cache decoded bundles and DBFs in this directory"
+		)
+		self._p.add_argument(
+			"--clear-cache", action="store_true",
+			help="Clear the --cache-dir before running"
+		)
+		self._p.add_argument(
+			"--json-dir", type=str,
+			help="Also export HearthstoneJSON to this directory, from the processed cards"
+		)
+		self._p.add_argument(
+			"--json-locale", type=str, nargs="*",
+			help="Only export these locales to --json-dir"
+		)
+		self._p.add_argument(
+			"--db", type=str,
+			help="Also write the processed cards to this SQLite database (see carddb.py)"
+		)
+		self._p.add_argument(
+			"--profile", type=str,
+			help="Write the time and peak memory of each phase to this JSON file"
+		)
+		self._p.add_argument(
+			"--trace", type=str,
+			help="Write the phases as a Chrome trace (chrome://tracing) to this file"
+		)
 
 		# File inputs
 		self.manifest_csv = None
@@ -128,6 +687,9 @@ class CardXMLProcessor:
 		self.card_dbf = None
 		self.card_tag_dbf = None
 		self.bundles = []
+		self.cache = None
+		self.text_rules = None
+		self.profiler = NullProfiler()
 
 		# The final dict of entities
 		self.entities = {}
@@ -159,28 +721,51 @@ class CardXMLProcessor:
 			# Only parse files that have a whitelisted name
 			return
 
-		with open(path, "rb") as f:
-			bundle = unitypack.load(f)
-			asset = bundle.assets[0]
-			self.info("Processing %r" % (asset))
-
-			if os.path.basename(path) == "dbf.unity3d":
-				self.parse_dbf_unity_asset(asset)
-				return
-
-			for obj in asset.objects.values():
-				if obj.type == "TextAsset":
-					d = obj.read()
-					if d.name in IGNORE_LOCALES:
-						continue
-					if d.script.startswith("<CardDefs>"):
-						xml = ElementTree.fromstring(d.script)
-						self.parse_full_carddefs(xml, d.name)
-					elif d.script.startswith("<?xml "):
-						xml = ElementTree.fromstring(d.script.encode("utf-8"))
-						self.parse_single_entity_xml(xml, d.name, locale=None)
-					else:
-						self.error("Bad TextAsset: %r" % (d))
+		name = os.path.basename(path)
+		with self.profiler.phase("decode %s" % (name), path=path):
+			data = read_file(path, read_bundle, self.cache)
+		with self.profiler.phase("merge %s" % (name), path=path):
+			self.parse_bundle_data(*data)
+
+	def parse_bundles(self, paths, jobs=1):
+		paths = [path for path in paths if os.path.basename(path) in self.unity3d_filenames]
+		if jobs <= 1 or len(paths) <= 1:
+			for path in paths:
+				self.parse_bundle(path)
+			return
+
+		# Bundles are decoded in parallel but merged in order, so that the
+		# first entity seen still wins.
+		context = multiprocessing.get_context("fork")
+		with context.Pool(min(jobs, len(paths))) as pool:
+			if self.profiler.enabled:
+				read = partial(_read_bundle_profiled, cache=self.cache)
+			else:
+				read = partial(read_file, func=read_bundle, cache=self.cache)
+
+			for path, result in zip(paths, pool.imap(read, paths)):
+				if self.profiler.enabled:
+					result, phases = result
+					self.profiler.extend(phases)
+				with self.profiler.phase("merge %s" % (os.path.basename(path)), path=path):
+					self.parse_bundle_data(*result)
+
+	def parse_bundle_data(self, asset_name, kind, data):
+		self.info("Processing %s" % (asset_name))
+
+		if kind == "dbf":
+			self.parse_dbf_unity_data(asset_name, data)
+			return
+
+		for name, script in data:
+			if script.startswith("<CardDefs>"):
+				entities = iter_carddefs_entities(io.BytesIO(script.encode("utf-8")))
+				self.parse_full_carddefs(entities, name)
+			elif script.startswith("<?xml "):
+				xml = ElementTree.fromstring(script.encode("utf-8"))
+				self.parse_single_entity_xml(xml, name, locale=None)
+			else:
+				self.error("Bad TextAsset: %r in %s" % (name, asset_name))
 
 	def parse_single_entity_xml(self, xml, id, locale=None):
 		"""
@@ -194,7 +779,7 @@ class CardXMLProcessor:
 
 		for e in xml:
 			if e.tag == "Tag":
-				tag = GameTag(int(e.attrib["enumID"]))
+				tag = get_gametag(e.attrib["enumID"])
 				if e.attrib["type"] == "String":
 					if locale:
 						self.entity_strings[id][tag][locale] = e.text
@@ -205,7 +790,7 @@ class CardXMLProcessor:
 					value = int(e.attrib["value"])
 					entity.tags[tag] = value
 			elif e.tag == "ReferencedTag":
-				tag = GameTag(int(e.attrib["enumID"]))
+				tag = get_gametag(e.attrib["enumID"])
 				value = int(e.attrib["value"])
 				entity.referenced_tags[tag] = value
 			elif e.tag == "MasterPower":
@@ -236,21 +821,31 @@ class CardXMLProcessor:
 
 	def parse_raw(self, f):
 		name = os.path.splitext(os.path.basename(f.name))[0]
-		xml = ElementTree.fromstring(f.read())
-		self.parse_full_carddefs(xml, name)
+		self.parse_full_carddefs(iter_carddefs_entities(f), name)
 
-	def parse_full_carddefs(self, xml, locale):
+	def parse_full_carddefs(self, entities, locale):
+		"""
+		Merge a locale's CardDefs into the entities and their strings.
+		entities is either the CardDefs element or an iterable of its Entity
+		elements (see iter_carddefs_entities).
+		"""
 		self.info("Reading full CardDefs file %r" % (locale))
 
-		for entity_xml in xml.findall("Entity"):
+		for entity_xml in entities:
+			if entity_xml.tag != "Entity":
+				continue
+
 			id = entity_xml.attrib["CardID"]
 			if id not in self.entities:
+				# Also reads the entity's strings for this locale
 				self.parse_single_entity_xml(entity_xml, id, locale)
+				continue
 
 			# Parse the entity's strings into self.entity_strings
-			for e in entity_xml.findall("Tag[@type='String']"):
-				tag = GameTag(int(e.attrib["enumID"]))
-				self.entity_strings[id][tag][locale] = e.text
+			strings = self.entity_strings[id]
+			for e in entity_xml:
+				if e.tag == "Tag" and e.attrib.get("type") == "String":
+					strings[get_gametag(e.attrib["enumID"])][locale] = e.text
 
 	def parse_manifest_csv(self, path):
 		self.info("Processing manifest %r" % (path))
@@ -267,23 +862,11 @@ class CardXMLProcessor:
 
 	def parse_card_dbf(self, path):
 		self.info("Processing CARD DBF %r" % (path))
-		dbf = Dbf.load(path)
+		records = read_file(path, read_card_dbf, self.cache)
 
-		# Whether we'll set the CARD_TAG dbf-style (post-15590) string tags
-		apply_locstrings = "NAME" in dbf.columns
-
-		for record in dbf.records:
-			id = record["ID"]
-			card_id = record["NOTE_MINI_GUID"]
-			long_guid = record.get("LONG_GUID", "")
-			hero_power_id = record.get("HERO_POWER_ID")
-			artist = record.get("ARTIST_NAME", "") or ""
-
-			if apply_locstrings:
-				self.entity_strings[card_id] = {}
-				for tag, column, _ in self.tag_dbf_localized_columns:
-					r = record.get(column) or {}
-					self.entity_strings[card_id][tag] = r
+		for id, card_id, long_guid, hero_power_id, artist, strings in records:
+			if strings is not None:
+				self.entity_strings[card_id] = strings
 
 			self.record_card(id, card_id, long_guid, hero_power_id, artist)
 
@@ -308,15 +891,9 @@ class CardXMLProcessor:
 
 	def parse_card_tag_dbf(self, path):
 		self.info("Processing CARD_TAG DBF %r" % (path))
-		dbf = Dbf.load(path)
-
-		for record in dbf.records:
-			dbf_id = record["CARD_ID"]
-			tag = record["TAG_ID"]
-			value = record["TAG_VALUE"]
-			is_reference = record["IS_REFERENCE_TAG"]
-			is_power = record["IS_POWER_KEYWORD_TAG"]
-			self.record_card_tag(dbf_id, tag, value, is_reference, is_power)
+
+		for record in read_file(path, read_card_tag_dbf, self.cache):
+			self.record_card_tag(*record)
 
 	def record_card_tag(self, dbf_id, tag, value, is_reference, is_power):
 		# TODO: is_power
@@ -328,17 +905,8 @@ class CardXMLProcessor:
 		else:
 			self.entities[card_id].tags[tag] = value
 
-	def parse_dbf_unity_asset(self, asset):
-		self.info("Processing DBFs as Unity3D bundle: %r" % (asset))
-		data = {}
-
-		for obj in asset.objects.values():
-			d = obj.read()
-			if "Records" in d and "m_Name" in d:
-				name = d["m_Name"]
-				records = d["Records"]
-				data[name] = records
-
+	def parse_dbf_unity_data(self, asset_name, data):
+		self.info("Processing DBFs as Unity3D bundle: %s" % (asset_name))
 		assert data
 		for record in data["CARD"]:
 			id = record["m_ID"]
@@ -374,14 +942,17 @@ class CardXMLProcessor:
 			if event_timing == "always" or event_timing in current_events:
 				self.record_card_tag(dbf_id, GameTag.CARD_SET, set_id, 0, 0)
 
-	def generate_xml(self):
+	def generate_xml(self, f):
 		self.info("Processing %i entities" % (len(self.entities)))
 		root = ElementTree.Element("CardDefs", build=str(self.build))
 		ids = sorted(self.entities.keys(), key=str.lower)
-		for id in ids:
-			root.append(self.entities[id].to_xml())
+		write_pretty_xml(f, root, (self.entities[id].to_xml() for id in ids))
 
-		return pretty_xml(root)
+	def export_json(self, output_dir):
+		ids = sorted(self.entities.keys(), key=str.lower)
+		db = {id: entity_to_card(self.entities[id]) for id in ids}
+		self.info("Exporting %i cards to %r" % (len(db), output_dir))
+		export_cards(db, output_dir, get_locales(self.args.json_locale), jobs=self.args.jobs)
 
 	def clean_entity(self, entity):
 		# Update entity strings from self.entity_strings
@@ -405,42 +976,7 @@ class CardXMLProcessor:
 					if text:
 						entity.strings[tag][locale] = text
 
-		description = entity.description
-
-		# Parse the exact overload amount
-		if entity.overload:
-			assert entity.overload == 1
-			overload = guess_overload(description)
-			if not overload:
-				self.warn("Could not guess overload for %r: %r" % (entity, description))
-			else:
-				entity.tags[GameTag.OVERLOAD] = overload
-
-		# Parse the exact spellpower amount
-		if entity.spell_damage:
-			assert entity.spell_damage == 1
-			sp = guess_spellpower(description)
-			if not sp:
-				self.warn("Could not guess spell power for %r: %r" % (entity, description))
-			else:
-				entity.tags[GameTag.SPELLPOWER] = sp
-
-		# Set the "shrouded" tags if available
-		if self.build < 6024:
-			SHROUDED = "Can't be targeted by Spells or Hero Powers."
-		else:
-			SHROUDED = "Can't be targeted by spells or Hero Powers."
-		if SHROUDED in description:
-			entity.tags[GameTag.CANT_BE_TARGETED_BY_SPELLS] = True
-			entity.tags[GameTag.CANT_BE_TARGETED_BY_HERO_POWERS] = True
-
-		# Set the CANT_ATTACK tag if available
-		if "Can't attack." in description or "Can't Attack." in description:
-			entity.tags[GameTag.CANT_ATTACK] = True
-
-		# Mark all spare parts with the SPARE_PART tag
-		if SPARE_PART_RE.match(entity.id):
-			entity.tags[GameTag.SPARE_PART] = True
+		self.text_rules.apply(entity, self.warn)
 
 		if entity.id in MISSING_HERO_POWERS:
 			assert not entity.tags.get(GameTag.HERO_POWER, 0)
@@ -460,17 +996,37 @@ class CardXMLProcessor:
 				entity.entourage[i] = self.guids[entourage]
 
 	def autodetect_files_to_parse(self, dirname):
-		for basename, dirs, files in os.walk(dirname):
-			if basename.endswith("/DBF") and not self.dbf_dir:
-				self.dbf_dir = basename
-
-			for fname in files:
-				if fname in self.unity3d_filenames:
-					print("Adding %r to bundles" % (fname))
-					path = os.path.join(basename, fname)
-					self.bundles.append(path)
-				elif fname == "manifest.csv":
-					self.manifest_csv = os.path.join(basename, fname)
+		bundles = set(self.unity3d_filenames)
+		# Where the card database is, depending on the build
+		card_db = {"dbf.unity3d", "DBF", "manifest.csv"}
+		filenames = bundles | {"manifest.csv"}
+		dirnames = {"DBF"}
+
+		def is_complete(names):
+			# The bundles of an install are all in one directory
+			return bool(names & (bundles - card_db)) and bool(names & card_db)
+
+		found = probe_game_files(dirname, filenames, dirnames)
+		names = {name for name, path in found}
+		if not is_complete(names):
+			self.info("Some game files are not in the usual places of %r, scanning all of it" % (dirname))
+			# Only look for what the probes missed
+			if names & (bundles - card_db):
+				filenames -= bundles - card_db
+			found += walk_game_files(
+				dirname, filenames - names, dirnames - names,
+				lambda walk_names: is_complete(names | walk_names)
+			)
+
+		for fname, path in found:
+			if fname == "DBF":
+				if not self.dbf_dir:
+					self.dbf_dir = path
+			elif fname in self.unity3d_filenames:
+				print("Adding %r to bundles" % (fname))
+				self.bundles.append(path)
+			elif fname == "manifest.csv":
+				self.manifest_csv = path
 
 	def run(self, args):
 		self.args = self._p.parse_args(args)
@@ -479,6 +1035,30 @@ class CardXMLProcessor:
 		if self.build is None:
 			self.error("Could not detect build. Use --build.")
 
+		if self.args.cache_dir:
+			self.cache = DecodeCache(self.args.cache_dir)
+			if self.args.clear_cache:
+				self.info("Clearing cache %r" % (self.args.cache_dir))
+				self.cache.clear()
+		elif self.args.clear_cache:
+			self.error("--clear-cache requires --cache-dir")
+
+		if self.args.profile or self.args.trace:
+			self.profiler = PhaseProfiler()
+
+		with self.profiler.phase("total"):
+			self.process()
+
+		if self.args.profile:
+			self.info("Writing profile to %r" % (self.args.profile))
+			self.profiler.write_report(self.args.profile)
+		if self.args.trace:
+			self.info("Writing trace to %r" % (self.args.trace))
+			self.profiler.write_trace(self.args.trace)
+
+	def process(self):
+		profiler = self.profiler
+
 		if self.args.manifest_csv:
 			self.manifest_csv = self.args.manifest_csv
 
@@ -488,7 +1068,8 @@ class CardXMLProcessor:
 		for f in self.args.files:
 			if os.path.isdir(f):
 				self.info("%r is a directory. Autodetecting game files." % (f))
-				self.autodetect_files_to_parse(f)
+				with profiler.phase("autodetect", path=f):
+					self.autodetect_files_to_parse(f)
 			else:
 				self.bundles.append(f)
 
@@ -496,12 +1077,13 @@ class CardXMLProcessor:
 			# Parse enUS.txt, frFR.txt, etc
 			for path in self.bundles:
 				if path.endswith((".txt", ".xml")):
-					with open(path, "rb") as f:
-						self.parse_raw(f)
+					with profiler.phase("raw %s" % (os.path.basename(path)), path=path):
+						with open(path, "rb") as f:
+							self.parse_raw(f)
 		else:
 			self.bundles = sort_bundles(self.bundles)
-			for path in self.bundles:
-				self.parse_bundle(path)
+			with profiler.phase("bundles"):
+				self.parse_bundles(self.bundles, self.args.jobs)
 
 		if self.dbf_dir:
 			path = os.path.join(self.dbf_dir, "CARD.xml")
@@ -514,29 +1096,52 @@ class CardXMLProcessor:
 				self.card_tag_dbf = path
 
 		if self.card_dbf:
-			self.parse_card_dbf(self.card_dbf)
+			with profiler.phase("card_dbf", path=self.card_dbf):
+				self.parse_card_dbf(self.card_dbf)
 
 		if self.card_tag_dbf:
-			self.parse_card_tag_dbf(self.card_tag_dbf)
+			with profiler.phase("card_tag_dbf", path=self.card_tag_dbf):
+				self.parse_card_tag_dbf(self.card_tag_dbf)
 
 		if self.manifest_csv:
 			if self.dbf_ids:
 				self.warn("Found %r but we already have a card database..." % (self.manifest_csv))
-			self.parse_manifest_csv(self.manifest_csv)
+			with profiler.phase("manifest_csv", path=self.manifest_csv):
+				self.parse_manifest_csv(self.manifest_csv)
 
 		if not self.dbf_ids:
 			self.warn("No DBF database found. Specify one with --dbf-dir or --manifest-csv.")
 
-		for entity in self.entities.values():
-			self.clean_entity(entity)
-
-		xml = self.generate_xml()
-
-		if self.args.outfile:
-			self.info("Writing to %r" % (self.args.outfile.name))
-			self.args.outfile.write(xml)
-		else:
-			sys.stdout.write(xml.decode("utf-8"))
+		# The rules for this build are selected once, not for each entity
+		self.text_rules = TextRuleEngine(TEXT_RULES, self.build)
+		with profiler.phase("clean_entity", entities=len(self.entities)):
+			for entity in self.entities.values():
+				self.clean_entity(entity)
+
+		for line in self.text_rules.report():
+			self.info(line)
+
+		if self.args.json_dir:
+			# Before the XML, which is not needed to publish HearthstoneJSON
+			with profiler.phase("export_json", path=self.args.json_dir):
+				# Keep stdout for the XML
+				with redirect_stdout(sys.stderr):
+					self.export_json(self.args.json_dir)
+
+		if self.args.db:
+			with profiler.phase("write_db", path=self.args.db):
+				ids = sorted(self.entities.keys(), key=str.lower)
+				# Keep stdout for the XML
+				with redirect_stdout(sys.stderr):
+					write_card_db(self.args.db, (self.entities[id] for id in ids), self.build)
+
+		with profiler.phase("generate_xml"):
+			if self.args.outfile:
+				self.info("Writing to %r" % (self.args.outfile.name))
+				self.generate_xml(self.args.outfile)
+			else:
+				sys.stdout.flush()
+				self.generate_xml(sys.stdout.buffer)
 
 
 def main():
@@ -1,8 +1,11 @@
 #!/usr/bin/env python
 
+import mimetypes
+import os
 import sys
 import boto3
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 
 
@@ -39,14 +42,47 @@ def update_website_configuration(s3, build, bucket=API_BUCKET):
 		print("Website configuration up-to-date")
 
 
+def upload_files(s3, dirname, paths, bucket, prefix="", jobs=10):
+	"""
+	Upload the files at paths, relative to dirname, to bucket under prefix.
+	"""
+	def upload(path):
+		# The same Content-Type as "aws s3 cp" guesses
+		content_type = mimetypes.guess_type(path)[0] or "binary/octet-stream"
+		s3.upload_file(
+			os.path.join(dirname, path), bucket, prefix + path,
+			ExtraArgs={"ContentType": content_type}
+		)
+		return path
+
+	# The S3 client is thread-safe; uploads are mostly waiting on the network
+	with ThreadPoolExecutor(jobs) as executor:
+		for path in executor.map(upload, paths):
+			print("upload: %s to s3://%s/%s%s" % (os.path.join(dirname, path), bucket, prefix, path))
+
+
 def main():
 	parser = ArgumentParser()
 	parser.add_argument("--build", type=int, nargs=1)
+	parser.add_argument(
+		"--upload-list", type=str,
+		help="Upload the files listed in this file, one path relative to dir per line"
+	)
+	parser.add_argument("--bucket", type=str, default=ART_BUCKET)
+	parser.add_argument("--prefix", type=str, default="v1/")
+	parser.add_argument("-j", "--jobs", type=int, default=10, help="Concurrent uploads")
 	parser.add_argument("dir", type=str, nargs="+")
 
 	args = parser.parse_args(sys.argv[1:])
 	s3 = boto3.client("s3")
 
+	if args.upload_list:
+		with open(args.upload_list, "r") as f:
+			paths = [line.rstrip("\n") for line in f if line.strip()]
+		print("Uploading %i files to s3://%s/%s" % (len(paths), args.bucket, args.prefix))
+		upload_files(s3, args.dir[0], paths, args.bucket, args.prefix, args.jobs)
+		return
+
 	update_website_configuration(s3, args.build[0])
 
 
@@ -0,0 +1,48 @@
+import pytest
+from hearthstone.cardxml import CardXML
+from hearthstone.enums import CardSet, CardType, GameTag, PlayReq
+from lxml import etree as ElementTree
+
+from carddb import CardDB, write_card_db
+
+
+def make_card(id, dbf_id, card_set, taunt):
+	card = CardXML(id)
+	card.dbf_id = dbf_id
+	card.tags[GameTag.CARDTYPE] = CardType.MINION
+	card.tags[GameTag.CARD_SET] = card_set
+	card.tags[GameTag.TAUNT] = taunt
+	card.referenced_tags[GameTag.DIVINE_SHIELD] = 1
+	card.strings[GameTag.CARDNAME] = {"enUS": "Name", "frFR": "Nom é"}
+	card.strings[GameTag.ARTISTNAME] = "Artist"
+	card.master_power = "Power"
+	card.entourage = ["TST_002", "TST_001"]
+	card.powers = [{
+		"definition": "Definition",
+		"requirements": {PlayReq.REQ_TARGET_TO_PLAY: 0, PlayReq.REQ_MINION_TARGET: 0},
+	}]
+	return card
+
+
+def test_card_db(tmpdir):
+	cards = [
+		make_card("TST_001", 1, CardSet.EXPERT1, True),
+		make_card("TST_002", 2, CardSet.EXPERT1, False),
+		make_card("TST_003", 3, CardSet.CORE, True),
+	]
+	path = str(tmpdir.join("cards.db"))
+	write_card_db(path, cards, build=1)
+
+	with CardDB(path) as db:
+		assert db.build == 1
+		for card in cards:
+			expected = ElementTree.tostring(card.to_xml())
+			assert ElementTree.tostring(db.get_card(card.id).to_xml()) == expected
+			assert ElementTree.tostring(db.get_card(card.dbf_id).to_xml()) == expected
+
+		assert db.find_cards({GameTag.TAUNT: 1, GameTag.CARD_SET: CardSet.EXPERT1}) == ["TST_001"]
+		assert db.find_cards({GameTag.TAUNT: 1}) == ["TST_001", "TST_003"]
+		assert db.find_cards({}) == ["TST_001", "TST_002", "TST_003"]
+
+		with pytest.raises(KeyError):
+			db.get_card("TST_004")
@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+from PIL import Image
+
+from cardtiles import (
+	DEFAULT_TILE_PROPS, get_rect, generate_tile_image, generate_tile_image_pillow,
+	generate_tile_images
+)
+
+
+def make_image(mode, size, seed):
+	pixels = np.random.RandomState(seed).randint(0, 256, (size, size, len(mode)), dtype=np.uint8)
+	return Image.fromarray(pixels[:, :, 0] if mode == "L" else pixels, mode)
+
+
+def make_tile_props(count):
+	rnd = random.Random(0)
+	ret = [DEFAULT_TILE_PROPS]
+	while len(ret) < count:
+		props = (
+			rnd.uniform(-2, 2), rnd.uniform(-2, 2),
+			rnd.choice((-1, 1)) * rnd.uniform(0.5, 1.5), rnd.choice((-1, 1)) * rnd.uniform(0.5, 1.5),
+			rnd.uniform(-0.5, 0.5), rnd.uniform(-0.5, 0.5), rnd.uniform(0.5, 1.5),
+		)
+		x, y, width, height = get_rect(*props)
+		if width and height:
+			ret.append(props)
+	return ret
+
+
+def test_tile_wraps_around():
+	props_list = make_tile_props(200)
+	rects = [get_rect(*props) for props in props_list]
+	# Bars past the right edge, past the 2x tiled image and above the top
+	assert any(512 < x + width <= 1024 for x, y, width, height in rects)
+	assert any(x + width > 1024 for x, y, width, height in rects)
+	assert any(y < 0 for x, y, width, height in rects)
+	assert any(props[2] < 0 for props in props_list)
+
+
+def test_generate_tile_image():
+	props_list = make_tile_props(40)
+	images = [make_image("RGBA", 512, 1), make_image("RGB", 512, 2), make_image("L", 256, 3)]
+	for img in images:
+		for props in props_list:
+			tile = generate_tile_image(img, props)
+			assert tile.mode == "RGB"
+			assert tile.tobytes() == generate_tile_image_pillow(img, props).tobytes()
+
+
+def test_generate_tile_images():
+	props_list = make_tile_props(200)
+	portraits = [make_image("RGBA", 512, seed) for seed in range(4)]
+	images = [portraits[i % len(portraits)] for i in range(len(props_list))]
+	tiles = generate_tile_images(images, props_list)
+	assert len(tiles) == len(images)
+	for tile, img, props in zip(tiles, images, props_list):
+		assert tile.tobytes() == generate_tile_image_pillow(img, props).tobytes()
@@ -0,0 +1,42 @@
+import pytest
+
+from columnar import ColumnarCards, ColumnarWriter
+
+
+CARDS = [
+	{
+		"id": "TST_001", "dbfId": 1, "name": "Ragnaros", "cardClass": "NEUTRAL",
+		"collectible": True, "mechanics": ["TAUNT", "BATTLECRY"],
+		"entourage": ["TST_002"], "playRequirements": {"REQ_MINION_TARGET": 0},
+	},
+	{"id": "TST_002", "dbfId": 2, "name": "Ragnaros", "cardClass": "MAGE", "cost": 2 ** 40},
+	{"id": "TST_003", "dbfId": 3, "name": {"enUS": "Name", "frFR": "Nom"}, "mechanics": []},
+]
+
+
+def test_columnar_roundtrip(tmpdir):
+	filename = str(tmpdir.join("cards.columnar"))
+	writer = ColumnarWriter(filename, enum_fields=("cardClass", "mechanics"))
+	for card in CARDS:
+		writer.add(card)
+	writer.close()
+
+	with ColumnarCards(filename) as cards:
+		assert len(cards) == 3
+		assert list(cards) == CARDS
+		assert cards[-2] == CARDS[1]
+		assert cards.column("cardClass") == ["NEUTRAL", "MAGE", None]
+		assert cards.header["columns"]["cardClass"]["type"] == "enum"
+		assert cards.header["columns"]["entourage"]["type"] == "strlist"
+		assert cards.header["columns"]["name"]["type"] == "json"
+
+		with pytest.raises(IndexError):
+			cards[3]
+
+
+def test_columnar_bad_magic(tmpdir):
+	path = tmpdir.join("cards.json")
+	path.write("[]")
+
+	with pytest.raises(ValueError):
+		ColumnarCards(str(path))
@@ -0,0 +1,27 @@
+from hearthstone.dbf import Dbf
+
+from dbfreader import iter_dbf_records
+
+
+def test_iter_dbf_records(tmpdir):
+	dbf = Dbf()
+	dbf.name = "CARD"
+	dbf.columns.update([
+		("ID", "Int"),
+		("NOTE_MINI_GUID", "String"),
+		("COLLECTIBLE", "Bool"),
+		("NAME", "LocString"),
+	])
+	dbf.records = [
+		{"ID": 1, "NOTE_MINI_GUID": "TST_001", "COLLECTIBLE": True, "NAME": {"enUS": "A"}},
+		{"ID": 2, "NOTE_MINI_GUID": None, "COLLECTIBLE": False, "NAME": {"enUS": "B", "frFR": "é"}},
+	]
+	path = tmpdir.join("CARD.xml")
+	path.write_binary(dbf.to_xml())
+
+	columns = {}
+	records = list(iter_dbf_records(str(path), columns))
+	assert records == Dbf.load(str(path)).records
+	assert records[0]["COLLECTIBLE"] is True
+	assert records[1]["NOTE_MINI_GUID"] is None
+	assert columns == dict(dbf.columns)
@@ -0,0 +1,287 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from cardtiles import DEFAULT_TILE_PROPS, generate_tile_image, get_tile_props
+
+pytest.importorskip("unitypack")
+
+import generate_card_textures  # noqa: E402
+
+
+class FakeTexture:
+	"""
+	A decoded texture of a bundle: random pixels, or an unsupported format
+	if broken.
+	"""
+	format = 4
+	width = height = 512
+	decodes = 0
+
+	def __init__(self, seed, broken=False):
+		self.seed = seed
+		self.broken = broken
+
+	@property
+	def image_data(self):
+		return b"%i" % (self.seed)
+
+	@property
+	def image(self):
+		FakeTexture.decodes += 1
+		if self.broken:
+			raise NotImplementedError("Unimplemented format")
+		rnd = np.random.RandomState(self.seed)
+		return Image.fromarray(rnd.randint(0, 256, (512, 512, 4), dtype=np.uint8), "RGBA")
+
+
+class FakeObject:
+	def __init__(self, texture):
+		self.texture = texture
+
+	def read(self):
+		return self.texture
+
+
+class FakeAsset:
+	name = "CAB-cards"
+
+	def __init__(self):
+		self.objects = {}
+
+
+class FakePointer:
+	def __init__(self, asset, path_id):
+		self.asset = asset
+		self.path_id = path_id
+
+	def resolve(self):
+		return self.asset.objects[self.path_id].read()
+
+
+class FakeEnvironment:
+	# Resolves the TextureRefs of worker processes
+	asset = FakeAsset()
+
+	def load(self, f):
+		f.close()
+
+	def get_asset_by_filename(self, name):
+		assert name == self.asset.name.lower()
+		return self.asset
+
+
+def make_tile(ux, uy, usx=1, usy=1):
+	return {
+		"m_TexEnvs": {"_MainTex": {"m_Offset": {"x": ux, "y": uy}, "m_Scale": {"x": usx, "y": usy}}},
+		"m_Floats": {},
+	}
+
+
+def make_textures(textures):
+	"""
+	Return the texture pointers of textures, a dict of path to FakeTexture.
+	"""
+	asset = FakeEnvironment.asset = FakeAsset()
+	ret = {}
+	for path_id, (path, texture) in enumerate(sorted(textures.items())):
+		asset.objects[path_id] = FakeObject(texture)
+		ret[path] = FakePointer(asset, path_id)
+	return ret
+
+
+def run(tmpdir, monkeypatch, cards, textures, *args):
+	"""
+	Run generate_card_textures on cards, a dict of card id to (path, tile).
+	Returns the number of textures decoded in this process.
+	"""
+	bundle = tmpdir.join("cards0.unity3d")
+	bundle.ensure()
+	pointers = make_textures(textures)
+
+	def extract_info(files, filter_ids):
+		return {id: {"path": path, "tile": tile} for id, (path, tile) in cards.items()}, pointers
+
+	monkeypatch.setattr(generate_card_textures, "extract_info", extract_info)
+	monkeypatch.setattr(generate_card_textures, "UnityEnvironment", FakeEnvironment)
+	monkeypatch.setattr(sys, "argv", [
+		"generate_card_textures.py", "--formats", "png", "jpg"
+	] + list(args) + [str(bundle)])
+	FakeTexture.decodes = 0
+	generate_card_textures.main()
+	return FakeTexture.decodes
+
+
+def list_files(dirname):
+	ret = {}
+	for path in dirname.visit():
+		if path.check(file=True):
+			ret[path.relto(dirname)] = path.read_binary()
+	return ret
+
+
+CARDS = {
+	"TST_001": ("final/assets/a", {}),
+	"TST_002": ("final/assets/b", make_tile(-0.4, 0.2)),
+	"TST_003": ("final/assets/a", make_tile(-0.1, 0.3, -1)),
+	"TST_004": ("final/assets/c", {}),
+	"TST_005": ("final/assets/d", {}),
+}
+
+
+def make_card_textures(broken=()):
+	return {
+		path: FakeTexture(seed, broken=path in broken)
+		for seed, path in enumerate(sorted(set(path for path, tile in CARDS.values())))
+	}
+
+
+def test_render_jobs(tmpdir, monkeypatch, capsys):
+	textures = make_card_textures()
+	logs = []
+	for jobs in (1, 2):
+		outdir = tmpdir.join("out%i" % (jobs))
+		run(tmpdir, monkeypatch, CARDS, textures, "--outdir", str(outdir), "-j", str(jobs))
+		out, err = capsys.readouterr()
+		logs.append(out.replace(str(outdir), "OUTDIR"))
+		assert not err
+
+	assert logs[0] == logs[1]
+	assert "with 4 texture decodes" in logs[0]
+	files = list_files(tmpdir.join("out1"))
+	# orig, png and jpg tiles and two jpg thumbnails of each card
+	assert len(files) == 5 * 5
+	assert files == list_files(tmpdir.join("out2"))
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_render_errors(tmpdir, monkeypatch, capsys, jobs):
+	textures = make_card_textures(broken={"final/assets/b"})
+	outdir = tmpdir.join("out")
+	run(tmpdir, monkeypatch, CARDS, textures, "--outdir", str(outdir), "-j", str(jobs))
+	out, err = capsys.readouterr()
+
+	# The error is reported and the other cards are still rendered
+	assert err == (
+		"ERROR on 'final/assets/b' ('TST_002'): Unimplemented format (Use --traceback for details)\n"
+	)
+	assert sorted(os.listdir(str(outdir.join("orig")))) == [
+		"TST_001.png", "TST_003.png", "TST_004.png", "TST_005.png",
+	]
+	assert "Rendered 5 cards from 4 textures" in out
+
+
+def test_render_traceback(tmpdir, monkeypatch, capsys):
+	textures = make_card_textures(broken={"final/assets/b"})
+	outdir = tmpdir.join("out")
+	with pytest.raises(NotImplementedError):
+		run(tmpdir, monkeypatch, CARDS, textures, "--outdir", str(outdir), "--traceback")
+	# Stopped at the first error; TST_003 shares the texture of TST_001, rendered first
+	assert sorted(os.listdir(str(outdir.join("orig")))) == ["TST_001.png", "TST_003.png"]
+
+	with pytest.raises(RuntimeError):
+		run(tmpdir, monkeypatch, CARDS, textures, "--outdir", str(outdir), "--traceback", "-j", "2")
+	out, err = capsys.readouterr()
+	assert "NotImplementedError: Unimplemented format" in err
+	assert "Rendered" not in out
+
+
+def test_shared_texture(tmpdir, monkeypatch):
+	texture = FakeTexture(1)
+	tile = make_tile(-0.1, 0.3, -1)
+	cards = {
+		"TST_001": ("final/assets/a", {}),
+		"TST_002": ("final/assets/a", {}),
+		"TST_003": ("final/assets/a", tile),
+	}
+	outdir = tmpdir.join("out")
+	decodes = run(tmpdir, monkeypatch, cards, {"final/assets/a": texture}, "--outdir", str(outdir))
+	assert decodes == 1
+
+	# The same outputs are hardlinks of the first card's
+	for dirname, ext in (("orig", ".png"), ("tiles", ".png"), ("tiles", ".jpg"), ("256x", ".jpg")):
+		first = outdir.join(dirname, "TST_001" + ext)
+		assert first.samefile(outdir.join(dirname, "TST_002" + ext))
+	# Thumbnails don't depend on the tile material
+	assert first.stat().nlink == 3
+	assert outdir.join("orig", "TST_001.png").samefile(outdir.join("orig", "TST_003.png"))
+
+	# Except the tiles of a card with its own tile material
+	tile_png = outdir.join("tiles", "TST_003.png")
+	assert not tile_png.samefile(outdir.join("tiles", "TST_001.png"))
+	expected = generate_tile_image(texture.image, get_tile_props(tile))
+	with Image.open(str(tile_png)) as img:
+		assert img.tobytes() == expected.tobytes()
+	with Image.open(str(outdir.join("tiles", "TST_001.png"))) as img:
+		assert img.tobytes() == generate_tile_image(texture.image, DEFAULT_TILE_PROPS).tobytes()
+
+
+def run_incremental(tmpdir, monkeypatch, cards, textures):
+	"""
+	Run an --incremental render into tmpdir/out; returns the number of
+	texture decodes and the changed list.
+	"""
+	changed = tmpdir.join("changed.txt")
+	decodes = run(
+		tmpdir, monkeypatch, cards, textures,
+		"--outdir", str(tmpdir.join("out")), "--incremental", "--changed-list", str(changed)
+	)
+	return decodes, changed.read().splitlines()
+
+
+def card_files(id, tiles_only=False):
+	ret = ["tiles/%s.jpg" % (id), "tiles/%s.png" % (id)]
+	if not tiles_only:
+		ret += ["256x/%s.jpg" % (id), "512x/%s.jpg" % (id), "orig/%s.png" % (id)]
+	return ret
+
+
+def test_incremental_rerun(tmpdir, monkeypatch):
+	textures = make_card_textures()
+	decodes, changed = run_incremental(tmpdir, monkeypatch, CARDS, textures)
+	assert decodes == 4
+	assert len(changed) == 5 * 5
+	files = list_files(tmpdir.join("out"))
+
+	decodes, changed = run_incremental(tmpdir, monkeypatch, CARDS, textures)
+	assert decodes == 0
+	assert changed == []
+	assert list_files(tmpdir.join("out")) == files
+
+
+def test_incremental_changes(tmpdir, monkeypatch):
+	textures = make_card_textures()
+	run_incremental(tmpdir, monkeypatch, CARDS, textures)
+	out = tmpdir.join("out")
+	tile = out.join("tiles", "TST_001.png").read_binary()
+
+	# A new texture for the cards of a, new tile props for TST_004
+	textures["final/assets/a"] = FakeTexture(10)
+	cards = dict(CARDS)
+	cards["TST_004"] = ("final/assets/c", make_tile(-0.4, 0.2))
+	decodes, changed = run_incremental(tmpdir, monkeypatch, cards, textures)
+
+	assert decodes == 2
+	assert sorted(changed) == sorted(
+		card_files("TST_001") + card_files("TST_003") + card_files("TST_004", tiles_only=True)
+	)
+	assert out.join("tiles", "TST_001.png").read_binary() != tile
+
+
+def test_incremental_new_card(tmpdir, monkeypatch):
+	textures = make_card_textures()
+	run_incremental(tmpdir, monkeypatch, CARDS, textures)
+	out = tmpdir.join("out")
+
+	cards = dict(CARDS)
+	cards["TST_006"] = ("final/assets/b", make_tile(-0.4, 0.2))
+	decodes, changed = run_incremental(tmpdir, monkeypatch, cards, textures)
+
+	# Linked to the outputs of TST_002, which the manifest says are current
+	assert decodes == 0
+	assert sorted(changed) == sorted(card_files("TST_006"))
+	for path in card_files("TST_006"):
+		assert out.join(path).samefile(out.join(path.replace("TST_006", "TST_002")))
@@ -0,0 +1,238 @@
+import gzip
+import json
+import shutil
+
+import columnar
+import pytest
+
+from hearthstone.cardxml import CardXML, load
+from hearthstone.enums import CardClass, CardType, GameTag, Rarity
+from hearthstone.utils import ElementTree
+
+from cardindex import get_index_path, read_card
+from compressingwriter import CompressingWriter
+from generate_hearthstonejson import (
+	ALL_LOCALES, MANIFEST_FILENAME, SHARD_INDEX_FILENAME,
+	export_all_locales_cards_to_file, export_cards, export_cards_to_file, get_json_kwargs, get_locales,
+	iter_json_array, load_cards, serialize_card, serialize_card_skeleton, serialize_skeletons
+)
+
+
+def make_card(id, dbf_id, text):
+	card = CardXML(id)
+	card.dbf_id = dbf_id
+	card.tags[GameTag.CARDTYPE] = CardType.MINION
+	card.tags[GameTag.CLASS] = CardClass.MAGE
+	card.tags[GameTag.RARITY] = Rarity.RARE
+	card.tags[GameTag.COST] = 3
+	card.tags[GameTag.ATK] = 2
+	card.tags[GameTag.HEALTH] = 4
+	card.tags[GameTag.TAUNT] = 1
+	card.tags[GameTag.COLLECTIBLE] = 1
+	card.strings[GameTag.CARDNAME] = {"enUS": "Name", "frFR": "Nom"}
+	card.strings[GameTag.CARDTEXT_INHAND] = {"enUS": text, "frFR": text}
+	return card
+
+
+def test_serialize_card_skeleton_is_locale_invariant():
+	card = make_card("TST_001", 1, "<b>Taunt</b>")
+	skeleton = serialize_card_skeleton(card)
+
+	assert "name" not in skeleton
+	assert "text" not in skeleton
+	assert skeleton["mechanics"] == ["TAUNT"]
+
+	card.locale = "frFR"
+	obj = serialize_card(card, skeleton)
+	assert obj["name"] == "Nom"
+	assert obj["cardClass"] == "MAGE"
+	assert "name" not in skeleton
+	assert obj == serialize_card(card)
+
+
+def test_export_all_locales_is_repeatable(tmpdir):
+	cards = [make_card("TST_001", 1, "Deal 1 damage.@Collection")]
+	skeletons = serialize_skeletons(cards)
+
+	first = tmpdir.join("first.json")
+	second = tmpdir.join("second.json")
+	export_all_locales_cards_to_file(cards, str(first), skeletons)
+	export_all_locales_cards_to_file(cards, str(second), skeletons)
+
+	assert first.read_binary() == second.read_binary()
+	assert '"collectionText":{"enUS":"Collection","frFR":"Collection"}' in first.read_text("utf-8")
+
+
+def test_export_cards_to_file(tmpdir):
+	cards = [make_card("TST_001", 1, "Deal_1 damage.")]
+	path = tmpdir.join("cards.json")
+	export_cards_to_file(cards, str(path), "frFR")
+
+	assert path.read_text("utf-8") == (
+		'[{"attack":2,"cardClass":"MAGE","collectible":true,"cost":3,"dbfId":1,"health":4,'
+		'"id":"TST_001","mechanics":["TAUNT"],"name":"Nom","rarity":"RARE",'
+		'"text":"Deal\u00a01 damage.","type":"MINION"}]'
+	)
+
+
+def test_export_cards_parallel(tmpdir):
+	db = {
+		"TST_%03i" % (i): make_card("TST_%03i" % (i), i, "Text_%i@Collection" % (i))
+		for i in range(10)
+	}
+	locales = ["enUS", "frFR", ALL_LOCALES]
+	serial, parallel = tmpdir.mkdir("serial"), tmpdir.mkdir("parallel")
+	export_cards(db, str(serial), locales)
+	export_cards(db, str(parallel), locales, jobs=3)
+
+	for locale in locales:
+		for filename in ("cards.json", "cards.collectible.json"):
+			expected = serial.join(locale, filename).read_binary()
+			assert parallel.join(locale, filename).read_binary() == expected
+
+
+def test_iter_json_array():
+	items = [{"b": [1, 2], "a": "é\n"}, {}, {"c": {"d": None}}]
+
+	for pretty in (False, True):
+		kwargs = get_json_kwargs(pretty)
+		assert "".join(iter_json_array(items, pretty)) == json.dumps(items, **kwargs)
+		assert "".join(iter_json_array(iter(items), pretty)) == json.dumps(items, **kwargs)
+		assert "".join(iter_json_array([], pretty)) == json.dumps([], **kwargs)
+
+
+def test_compressing_writer(tmpdir):
+	brotli = pytest.importorskip("brotli")
+	path = str(tmpdir.join("cards.json"))
+	with CompressingWriter(path, compress=["gz", "br"]) as f:
+		f.write("[")
+		f.write('"é"')
+		f.write("]")
+
+	with open(path, "rb") as f:
+		data = f.read()
+	assert data == '["é"]'.encode("utf-8")
+
+	with gzip.open(path + ".gz", "rb") as f:
+		assert f.read() == data
+	with open(path + ".br", "rb") as f:
+		assert brotli.decompress(f.read()) == data
+
+
+def test_export_cards_incremental(tmpdir):
+	db = {"TST_001": make_card("TST_001", 1, "Text")}
+	locales = ["enUS", "frFR", ALL_LOCALES]
+	first, second = tmpdir.mkdir("first"), tmpdir.mkdir("second")
+	export_cards(db, str(first), locales, incremental=True)
+	assert first.join(MANIFEST_FILENAME).check()
+
+	db["TST_001"].strings[GameTag.CARDNAME]["frFR"] = "Autre nom"
+	export_cards(db, str(second), locales, previous_dir=str(first), incremental=True)
+
+	for filename in ("cards.json", "cards.collectible.json"):
+		# Unchanged files are hardlinked from the previous build
+		assert second.join("enUS", filename).samefile(first.join("enUS", filename))
+		assert not second.join("frFR", filename).samefile(first.join("frFR", filename))
+		assert not second.join("all", filename).samefile(first.join("all", filename))
+
+	assert "Autre nom" in second.join("frFR", "cards.json").read_text("utf-8")
+
+
+def test_export_cards_incremental_writer_change(tmpdir, monkeypatch):
+	db = {"TST_001": make_card("TST_001", 1, "Text")}
+	first, second = tmpdir.mkdir("first"), tmpdir.mkdir("second")
+	export_cards(db, str(first), ["enUS"], columnar=True, incremental=True)
+
+	# A change to the columnar writer invalidates the files written with it
+	changed = tmpdir.join("columnar.py")
+	shutil.copy(columnar.__file__, str(changed))
+	changed.write("# Changed\n", mode="a")
+	monkeypatch.setattr(columnar, "__file__", str(changed))
+	export_cards(db, str(second), ["enUS"], columnar=True, previous_dir=str(first), incremental=True)
+
+	assert not second.join("enUS", "cards.columnar").samefile(first.join("enUS", "cards.columnar"))
+
+
+def test_export_cards_rerun_keeps_previous_build(tmpdir):
+	db = {"TST_001": make_card("TST_001", 1, "Text")}
+	locales = ["enUS", ALL_LOCALES]
+	options = {"compress": ("gz", ), "columnar": True, "shards": True, "index": True}
+	first, second = tmpdir.mkdir("first"), tmpdir.mkdir("second")
+	export_cards(db, str(first), locales, incremental=True, **options)
+	export_cards(db, str(second), locales, previous_dir=str(first), incremental=True, **options)
+	assert second.join("enUS", "cards.json").samefile(first.join("enUS", "cards.json"))
+	before = {
+		path.relto(first): path.read_binary() for path in first.visit() if path.check(file=True)
+	}
+
+	# Rerunning into the second build rewrites its hardlinks, not the first build
+	db["TST_001"].strings[GameTag.CARDNAME]["enUS"] = "Other name"
+	export_cards(db, str(second), locales, previous_dir=str(first), incremental=True, **options)
+
+	assert "Other name" in second.join("enUS", "cards.json").read_text("utf-8")
+	for path, data in before.items():
+		assert first.join(path).read_binary() == data
+
+
+def test_export_cards_shards(tmpdir):
+	db = {
+		"TST_%03i" % (i): make_card("TST_%03i" % (i), i, "Text")
+		for i in range(3)
+	}
+	db["TST_002"].tags[GameTag.CLASS] = CardClass.PRIEST
+	export_cards(db, str(tmpdir), ["enUS"], shards=True)
+
+	locale_dir = tmpdir.join("enUS")
+	cards = json.loads(locale_dir.join("cards.json").read_text("utf-8"))
+	index = json.loads(locale_dir.join(SHARD_INDEX_FILENAME).read_text("utf-8"))
+
+	assert index["cards"]["ids"] == ["TST_000", "TST_001", "TST_002"]
+	assert index["shards"] == {
+		"classes/MAGE.json": ["TST_000", "TST_001"],
+		"classes/PRIEST.json": ["TST_002"],
+	}
+	assert json.loads(locale_dir.join("classes", "MAGE.json").read_text("utf-8")) == cards[:2]
+	assert json.loads(locale_dir.join("cards", "TST_002.json").read_text("utf-8")) == cards[2]
+	assert not locale_dir.join("sets").check()
+
+
+def test_export_cards_index(tmpdir):
+	db = {
+		"TST_%03i" % (i): make_card("TST_%03i" % (i), i + 1, "Text é %i" % (i))
+		for i in range(3)
+	}
+	export_cards(db, str(tmpdir), ["frFR", ALL_LOCALES], index=True)
+
+	for locale in ("frFR", ALL_LOCALES):
+		path = str(tmpdir.join(locale, "cards.json"))
+		assert tmpdir.join(locale, "cards.index.json").samefile(get_index_path(path))
+		with open(path, "r", encoding="utf-8") as f:
+			cards = json.load(f)
+		for card in cards:
+			assert read_card(path, card["id"]) == card
+			assert read_card(path, card["dbfId"]) == card
+
+
+def test_load_cards(tmpdir):
+	root = ElementTree.Element("CardDefs", build="1")
+	for i in range(3):
+		card = make_card("TST_%03i" % (i), i, "Text@Collection")
+		card.master_power = "Power %i" % (i)
+		root.append(card.to_xml())
+	path = tmpdir.join("CardDefs.xml")
+	path.write_binary(ElementTree.tostring(root, encoding="utf-8"))
+
+	db = load_cards(str(path))
+	expected, xml = load(str(path))
+	assert list(db) == list(expected)
+	for id, card in db.items():
+		assert card.master_power == expected[id].master_power.text
+		assert serialize_card(card) == serialize_card(expected[id])
+
+
+def test_get_locales():
+	locales = get_locales()
+	assert "enUS" in locales
+	assert locales[-1] == ALL_LOCALES
+	assert get_locales(["ENUS", "frfr"]) == ["enUS", "frFR"]
+	assert get_locales(["enUS", ALL_LOCALES]) == ["enUS", ALL_LOCALES]
@@ -0,0 +1,35 @@
+import json
+
+from phaseprofiler import NullProfiler, PhaseProfiler, call_profiled
+
+
+def test_phase_profiler(tmpdir):
+	profiler = PhaseProfiler()
+	with profiler.phase("outer"):
+		with profiler.phase("inner", path="cards.unity3d"):
+			data = b"x" * (16 * 1024 * 1024)
+		del data
+	result, phases = call_profiled("worker", {}, sum, [1, 2])
+	profiler.extend(phases)
+
+	assert result == 3
+	report = profiler.get_report()
+	outer, inner, worker = report["phases"]
+	assert (outer["name"], inner["name"], worker["name"]) == ("outer", "inner", "worker")
+	assert inner["args"] == {"path": "cards.unity3d"}
+	assert outer["start"] <= inner["start"] <= worker["start"]
+	assert outer["seconds"] >= inner["seconds"]
+	assert outer["peak_rss_kb"] >= inner["peak_rss_kb"] > 16 * 1024
+
+	path = tmpdir.join("trace.json")
+	profiler.write_trace(str(path))
+	events = json.loads(path.read_text("utf-8"))["traceEvents"]
+	assert [event["name"] for event in events] == ["outer", "inner", "worker"]
+	assert events[1]["args"]["path"] == "cards.unity3d"
+
+
+def test_null_profiler():
+	profiler = NullProfiler()
+	with profiler.phase("phase", path="x"):
+		pass
+	assert not profiler.enabled
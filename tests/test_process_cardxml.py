@@ -0,0 +1,454 @@
+import os
+import sys
+from xml.dom import minidom
+
+import pytest
+from hearthstone.cardxml import CardXML
+from hearthstone.enums import CardType, GameTag, PlayReq
+from lxml import etree as ElementTree
+
+pytest.importorskip("unitypack")
+
+import process_cardxml  # noqa: E402
+from generate_hearthstonejson import load_cards, serialize_card  # noqa: E402
+from process_cardxml import (  # noqa: E402
+	SPARE_PART_RE, TEXT_RULES, CardXMLProcessor, DecodeCache, TextRuleEngine, entity_to_card,
+	guess_overload, guess_spellpower, pretty_xml, walk_game_files
+)
+
+
+def minidom_pretty_xml(xml):
+	# pretty_xml() before it was streamed
+	ret = ElementTree.tostring(xml, encoding="utf-8")
+	ret = minidom.parseString(ret).toprettyxml(indent="\t", encoding="utf-8")
+	return b"\n".join(line for line in ret.split(b"\n") if line.strip())
+
+
+def make_tree(root, files):
+	for path in files:
+		if path.endswith("/"):
+			root.join(path).ensure(dir=True)
+		else:
+			root.join(path).ensure()
+
+
+def autodetect(dirname):
+	processor = CardXMLProcessor()
+	processor.autodetect_files_to_parse(str(dirname))
+	return processor
+
+
+def test_autodetect_files_outside_probes(tmpdir):
+	make_tree(tmpdir, ["Data/Win/cards0.unity3d", "Data/DBF/", "Strings/manifest.csv"])
+	processor = autodetect(tmpdir)
+
+	assert processor.bundles == [str(tmpdir.join("Data", "Win", "cards0.unity3d"))]
+	assert processor.dbf_dir == str(tmpdir.join("Data", "DBF"))
+	assert processor.manifest_csv == str(tmpdir.join("Strings", "manifest.csv"))
+
+
+def test_autodetect_modern_layout(tmpdir, monkeypatch):
+	make_tree(tmpdir, ["Data/Win/cards0.unity3d", "Data/Win/dbf.unity3d"] + [
+		"Data/Deep%i/Deeper/file.txt" % (i) for i in range(20)
+	])
+	listed = []
+	iter_dir = process_cardxml._iter_dir
+
+	def listing_iter_dir(path):
+		listed.append(path)
+		return iter_dir(path)
+
+	monkeypatch.setattr(process_cardxml, "_iter_dir", listing_iter_dir)
+	processor = autodetect(tmpdir)
+
+	assert sorted(processor.bundles) == [
+		str(tmpdir.join("Data", "Win", "cards0.unity3d")), str(tmpdir.join("Data", "Win", "dbf.unity3d")),
+	]
+	# Found by the probes, without scanning the rest of the install
+	assert not any("Deep" in path for path in listed)
+
+
+def test_autodetect_walk_stops_once_complete(tmpdir):
+	make_tree(tmpdir, [
+		"Game/cards0.unity3d", "Game/cards1.unity3d", "Game/DBF/", "Game/manifest.csv",
+		"Game/Backup/Old/cards.unity3d",
+	])
+	processor = autodetect(tmpdir)
+
+	assert sorted(processor.bundles) == [
+		str(tmpdir.join("Game", "cards0.unity3d")), str(tmpdir.join("Game", "cards1.unity3d")),
+	]
+	assert processor.dbf_dir == str(tmpdir.join("Game", "DBF"))
+
+
+def test_walk_game_files(tmpdir):
+	make_tree(tmpdir, ["a/x.txt", "a/b/DBF/x.txt", "c/d/e/x.txt", "c/d/e/f/y.txt"])
+	found = walk_game_files(str(tmpdir), {"x.txt", "y.txt"}, {"DBF"})
+	# DBF is not descended into, and the walk stops at the level of the last name
+	assert sorted(path[len(str(tmpdir)):] for name, path in found) == [
+		"/a/b/DBF", "/a/x.txt", "/c/d/e/f/y.txt", "/c/d/e/x.txt",
+	]
+
+	found = walk_game_files(str(tmpdir), {"x.txt", "y.txt"}, {"DBF"}, lambda names: "x.txt" in names)
+	assert [name for name, path in found] == ["x.txt"]
+
+
+def test_pretty_xml():
+	root = ElementTree.Element("CardDefs", build="1", note='<a & "b">')
+	entity = ElementTree.SubElement(root, "Entity", CardID="TST_001", version="2")
+	tag = ElementTree.SubElement(entity, "Tag", enumID="185", name="CARDNAME", type="LocString")
+	ElementTree.SubElement(tag, "enUS").text = "Fireball & <Frostbolt> \"é\""
+	ElementTree.SubElement(tag, "frFR").text = "Line 1\n\n  \t\nLine 2\r\nLine 3\rLine 4\n"
+	ElementTree.SubElement(tag, "deDE").text = "\n"
+	ElementTree.SubElement(entity, "Tag", enumID="48", type="Int", value="3")
+	ElementTree.SubElement(entity, "MasterPower").text = "abc"
+	ElementTree.SubElement(entity, "EntourageCard", cardID="TST_002")
+	ElementTree.SubElement(entity, "Empty")
+	mixed = ElementTree.SubElement(entity, "Mixed")
+	mixed.text = "before"
+	ElementTree.SubElement(mixed, "Child").tail = "after\n\nmore"
+	ElementTree.SubElement(root, "Entity", CardID="TST_002")
+
+	assert pretty_xml(root) == minidom_pretty_xml(root)
+	empty = ElementTree.Element("CardDefs", build="1")
+	assert pretty_xml(empty) == minidom_pretty_xml(empty)
+
+
+def make_entities():
+	minion = CardXML("TST_001")
+	minion.dbf_id = 1
+	minion.tags[GameTag.CARDTYPE] = CardType.MINION
+	minion.tags[GameTag.COST] = 4
+	minion.tags[GameTag.HERO_POWER] = 3
+	minion.hero_power = "TST_003"
+	minion.referenced_tags[GameTag.TAUNT] = 1
+	minion.strings[GameTag.CARDNAME] = {"enUS": "Name & <Co>", "frFR": "Nom \"é\"", "zhCN": "名字"}
+	minion.strings[GameTag.CARDTEXT_INHAND] = {
+		"enUS": "<b>Battlecry:</b> Summon\na random\r\nTotem.\n", "frFR": "  Cri de guerre\n\n\t: Totem",
+	}
+	minion.strings[GameTag.FLAVORTEXT] = {"enUS": "\n"}
+	minion.strings[GameTag.ARTISTNAME] = "Artist\nName"
+	minion.entourage = ["TST_002", "TST_003"]
+	minion.master_power = "a1b2c3"
+	minion.powers = [
+		{"definition": "a1b2c3", "requirements": {PlayReq.REQ_TARGET_TO_PLAY: None}},
+		{"definition": "d4e5f6", "requirements": {PlayReq.REQ_MINIMUM_ENEMY_MINIONS: 2}},
+	]
+
+	spell = CardXML("TST_002")
+	spell.dbf_id = 2
+	spell.tags[GameTag.CARDTYPE] = CardType.SPELL
+	spell.strings[GameTag.CARDNAME] = {"enUS": "Spell", "deDE": "Zauber"}
+	return {entity.id: entity for entity in (minion, spell)}
+
+
+def test_entity_to_card(tmpdir):
+	processor = CardXMLProcessor()
+	processor.build = 1
+	processor.entities = make_entities()
+	path = tmpdir.join("CardDefs.xml")
+	with open(str(path), "wb") as f:
+		processor.generate_xml(f)
+
+	for locale in ("enUS", "frFR", "deDE", "zhCN"):
+		cards = load_cards(str(path), locale)
+		assert sorted(cards) == sorted(processor.entities)
+		for id, entity in processor.entities.items():
+			card = entity_to_card(entity, locale)
+			assert serialize_card(card) == serialize_card(cards[id]), (id, locale)
+
+
+def make_carddefs(entities):
+	"""
+	Return a single-locale CardDefs document of entities, a list of
+	(id, cost, name, text).
+	"""
+	root = ElementTree.Element("CardDefs")
+	for id, cost, name, text in entities:
+		entity = ElementTree.SubElement(root, "Entity", CardID=id, version="2")
+		ElementTree.SubElement(entity, "Tag", enumID="185", name="CARDNAME", type="String").text = name
+		if text:
+			ElementTree.SubElement(entity, "Tag", enumID="184", name="CARDTEXT_INHAND", type="String").text = text
+		ElementTree.SubElement(entity, "Tag", enumID="48", name="COST", type="Int", value=str(cost))
+	return ElementTree.tostring(root, encoding="unicode")
+
+
+def dump_entities(processor):
+	return {
+		id: (ElementTree.tostring(entity.to_xml()), processor.entity_strings[id])
+		for id, entity in processor.entities.items()
+	}
+
+
+BUNDLES = {
+	"cards0.unity3d": [
+		("enUS", make_carddefs([("TST_001", 1, "One", "Text"), ("TST_002", 2, "Two", "")])),
+		("TST_003", '<?xml version="1.0"?>\n<Entity CardID="TST_003" version="2">'
+			'<Tag enumID="185" type="String"><enUS>Three</enUS></Tag></Entity>'),
+	],
+	"cards1.unity3d": [
+		("frFR", make_carddefs([("TST_001", 5, "Un", "Texte"), ("TST_004", 4, "Quatre", "")])),
+	],
+	"cards2.unity3d": [
+		("deDE", make_carddefs([("TST_004", 6, "Vier", ""), ("TST_002", 7, "Zwei", "")])),
+	],
+}
+
+
+def read_fake_bundle(path):
+	return os.path.basename(path), "xml", BUNDLES[os.path.basename(path)]
+
+
+def test_parse_bundles_jobs(tmpdir, monkeypatch):
+	monkeypatch.setattr(process_cardxml, "read_bundle", read_fake_bundle)
+	paths = [str(tmpdir.join(name)) for name in sorted(BUNDLES)]
+	dumps = []
+	for jobs in (1, 2):
+		processor = CardXMLProcessor()
+		processor.parse_bundles(paths, jobs=jobs)
+		dumps.append(dump_entities(processor))
+
+	assert dumps[0] == dumps[1]
+	# The first entity wins; later ones only add their strings
+	entities = processor.entities
+	assert sorted(entities) == ["TST_001", "TST_002", "TST_003", "TST_004"]
+	assert entities["TST_001"].cost == 1
+	assert entities["TST_004"].cost == 4
+	assert processor.entity_strings["TST_001"][GameTag.CARDNAME] == {"enUS": "One", "frFR": "Un"}
+	assert processor.entity_strings["TST_004"][GameTag.CARDNAME] == {"frFR": "Quatre", "deDE": "Vier"}
+
+
+def parse_full_carddefs_unrolled(processor, xml, locale):
+	# parse_full_carddefs() before it merged each entity in one pass
+	for entity_xml in xml.findall("Entity"):
+		id = entity_xml.attrib["CardID"]
+		if id not in processor.entities:
+			processor.parse_single_entity_xml(entity_xml, id, locale)
+
+		for e in entity_xml.findall("Tag[@type='String']"):
+			tag = GameTag(int(e.attrib["enumID"]))
+			processor.entity_strings[id][tag][locale] = e.text
+
+
+LOCALE_CARDDEFS = {
+	"enUS": make_carddefs([("TST_001", 1, "One", "Text"), ("TST_002", 2, "Two", "")]),
+	"frFR": make_carddefs([("TST_002", 3, "Deux", "Texte"), ("TST_001", 1, "Un", "Texte\n")]),
+	"deDE": make_carddefs([("TST_003", 3, "Drei", ""), ("TST_001", 1, "Eins", "")]),
+	"zhCN": make_carddefs([("TST_001", 1, "一", "文字"), ("TST_003", 3, "三", "文字")]),
+}
+
+
+def test_parse_full_carddefs(tmpdir):
+	# An entity with every kind of child, only in the enUS file
+	root = ElementTree.fromstring(LOCALE_CARDDEFS["enUS"])
+	entity = ElementTree.SubElement(root, "Entity", CardID="TST_004", version="2")
+	ElementTree.SubElement(entity, "MasterPower").text = "a1b2c3"
+	ElementTree.SubElement(entity, "Tag", enumID="185", type="String").text = "Four"
+	ElementTree.SubElement(entity, "Tag", enumID="380", type="Card", cardID="TST_001", value="1")
+	ElementTree.SubElement(entity, "ReferencedTag", enumID="190", value="1")
+	power = ElementTree.SubElement(entity, "Power", definition="a1b2c3")
+	ElementTree.SubElement(power, "PlayRequirement", reqID="1", param="")
+	ElementTree.SubElement(entity, "EntourageCard", cardID="TST_002")
+	ElementTree.SubElement(entity, "TriggeredPowerHistoryInfo", effectIndex="0", showInHistory="True")
+	documents = dict(LOCALE_CARDDEFS, enUS=ElementTree.tostring(root, encoding="unicode"))
+
+	expected = CardXMLProcessor()
+	streamed = CardXMLProcessor()
+	tree = CardXMLProcessor()
+	for locale, document in documents.items():
+		parse_full_carddefs_unrolled(expected, ElementTree.fromstring(document), locale)
+		path = tmpdir.join(locale + ".xml")
+		path.write_text(document, "utf-8")
+		with open(str(path), "rb") as f:
+			streamed.parse_raw(f)
+		tree.parse_full_carddefs(ElementTree.fromstring(document), locale)
+
+	assert sorted(expected.entities) == ["TST_001", "TST_002", "TST_003", "TST_004"]
+	assert dump_entities(streamed) == dump_entities(expected)
+	assert dump_entities(tree) == dump_entities(expected)
+
+
+def apply_text_rules_unrolled(entity, build, warn):
+	# The text heuristics before TextRuleEngine
+	description = entity.description
+	if entity.overload:
+		assert entity.overload == 1
+		overload = guess_overload(description)
+		if not overload:
+			warn("Could not guess overload for %r: %r" % (entity, description))
+		else:
+			entity.tags[GameTag.OVERLOAD] = overload
+
+	if entity.spell_damage:
+		assert entity.spell_damage == 1
+		sp = guess_spellpower(description)
+		if not sp:
+			warn("Could not guess spell power for %r: %r" % (entity, description))
+		else:
+			entity.tags[GameTag.SPELLPOWER] = sp
+
+	if build < 6024:
+		shrouded = "Can't be targeted by Spells or Hero Powers."
+	else:
+		shrouded = "Can't be targeted by spells or Hero Powers."
+	if shrouded in description:
+		entity.tags[GameTag.CANT_BE_TARGETED_BY_SPELLS] = True
+		entity.tags[GameTag.CANT_BE_TARGETED_BY_HERO_POWERS] = True
+
+	if "Can't attack." in description or "Can't Attack." in description:
+		entity.tags[GameTag.CANT_ATTACK] = True
+
+	if SPARE_PART_RE.match(entity.id):
+		entity.tags[GameTag.SPARE_PART] = True
+
+
+TEXT_RULE_CARDS = [
+	("TST_001", {GameTag.OVERLOAD: 1}, "Deal 3 damage. <b>Overload:</b> (2)"),
+	("TST_002", {GameTag.OVERLOAD: 1}, "Deal 3 damage. <b>Overload:</b> (0)"),
+	("TST_003", {GameTag.OVERLOAD: 1}, "<b>Overload</b> twice."),
+	("TST_004", {GameTag.OVERLOAD: 1}, "Deal 3 damage."),
+	("TST_005", {}, "<b>Overload:</b> (1)"),
+	("TST_006", {GameTag.SPELLPOWER: 1}, "<b>Spell Damage +2</b>"),
+	("TST_007", {GameTag.SPELLPOWER: 1}, "<b>Spell Power</b> +1"),
+	("TST_008", {GameTag.SPELLPOWER: 1}, "Your Spell costs (1) less."),
+	("TST_009", {GameTag.OVERLOAD: 1, GameTag.SPELLPOWER: 1}, "Spell Damage +1. Overload: (3)"),
+	("TST_010", {}, "Can't be targeted by Spells or Hero Powers."),
+	("TST_011", {}, "Can't be targeted by spells or Hero Powers."),
+	("TST_012", {}, "Can't attack."),
+	("TST_013", {}, "<b>Taunt</b>. Can't Attack."),
+	("PART_001", {}, "Give a minion +1 Health."),
+	("TST_PART_001", {}, "Not a spare part."),
+]
+
+
+def make_text_rule_card(id, tags, text):
+	card = CardXML(id)
+	card.tags.update(tags)
+	card.strings[GameTag.CARDTEXT_INHAND] = {"enUS": text}
+	return card
+
+
+@pytest.mark.parametrize("build", [6023, 6024, 25770])
+def test_text_rules(build):
+	engine = TextRuleEngine(TEXT_RULES, build)
+	for id, tags, text in TEXT_RULE_CARDS:
+		expected, card = make_text_rule_card(id, tags, text), make_text_rule_card(id, tags, text)
+		expected_warnings, warnings = [], []
+		apply_text_rules_unrolled(expected, build, expected_warnings.append)
+		engine.apply(card, warnings.append)
+		assert card.tags == expected.tags, id
+		assert warnings == expected_warnings, id
+
+	stats = engine.stats
+	assert (stats["overload"]["tried"], stats["overload"]["matched"]) == (5, 2)
+	assert (stats["spellpower"]["tried"], stats["spellpower"]["matched"]) == (4, 3)
+	assert stats["shrouded"]["matched"] == 1
+	assert stats["spare_part"]["matched"] == 1
+
+
+def test_text_rules_assert_tag_value():
+	engine = TextRuleEngine(TEXT_RULES, 6024)
+	# Checked whether or not the text matches, as before the rules
+	for text in ("<b>Overload:</b> (2)", "Deal 3 damage."):
+		with pytest.raises(AssertionError):
+			engine.apply(make_text_rule_card("TST_001", {GameTag.OVERLOAD: 2}, text), print)
+		with pytest.raises(AssertionError):
+			engine.apply(make_text_rule_card("TST_001", {GameTag.SPELLPOWER: 2}, text), print)
+
+
+DECODED = []
+
+
+def decode_plain(path):
+	DECODED.append(path)
+	with open(path, "r") as f:
+		return {"content": f.read()}
+
+
+def decode_lines(path):
+	with open(path, "r") as f:
+		for line in f:
+			DECODED.append(line)
+			yield line.strip()
+
+
+def list_cache_files(cache_dir):
+	return sorted(path.basename for path in cache_dir.visit() if path.check(file=True))
+
+
+def test_decode_cache(tmpdir):
+	del DECODED[:]
+	path = tmpdir.join("input.txt")
+	path.write("a\nb\n")
+	cache = DecodeCache(str(tmpdir.join("cache")))
+
+	assert cache.load(str(path), decode_plain) == {"content": "a\nb\n"}
+	assert cache.load(str(path), decode_plain) == {"content": "a\nb\n"}
+	assert len(DECODED) == 1
+
+	# A copy has the same content hash, a change doesn't
+	copy = tmpdir.join("copy.txt")
+	path.copy(copy)
+	assert cache.load(str(copy), decode_plain) == {"content": "a\nb\n"}
+	assert len(DECODED) == 1
+	path.write("c\n")
+	assert cache.load(str(path), decode_plain) == {"content": "c\n"}
+	assert len(DECODED) == 2
+
+
+def test_decode_cache_source_change(tmpdir, monkeypatch):
+	path = tmpdir.join("input.txt")
+	path.write("a\n")
+	decoder = tmpdir.join("decoder.py")
+	decoder.write("def decode(path):\n\treturn 1\n")
+	monkeypatch.syspath_prepend(str(tmpdir))
+	import decoder as module
+
+	cache_dir = str(tmpdir.join("cache"))
+	assert DecodeCache(cache_dir).load(str(path), module.decode) == 1
+	assert DecodeCache(cache_dir).load(str(path), module.decode) == 1
+
+	# An edited decoder doesn't return the entries of the previous one
+	decoder.write("def decode(path):\n\treturn \"changed\"\n")
+	del sys.modules["decoder"]
+	import decoder as module
+	assert DecodeCache(cache_dir).load(str(path), module.decode) == "changed"
+
+
+def test_decode_cache_generator(tmpdir):
+	del DECODED[:]
+	path = tmpdir.join("input.txt")
+	path.write("a\nb\nc\n")
+	cache_dir = tmpdir.join("cache")
+	cache = DecodeCache(str(cache_dir))
+
+	# Items are streamed as they are decoded
+	items = cache.load(str(path), decode_lines)
+	assert next(items) == "a"
+	assert DECODED == ["a\n"]
+
+	# An entry is only written once all the items have been read
+	items.close()
+	assert not any(name.endswith((".pickle", ".tmp")) for name in list_cache_files(cache_dir))
+
+	assert list(cache.load(str(path), decode_lines)) == ["a", "b", "c"]
+	assert len(DECODED) == 4
+	assert list(cache.load(str(path), decode_lines)) == ["a", "b", "c"]
+	assert len(DECODED) == 4
+
+
+def test_clear_cache(tmpdir):
+	del DECODED[:]
+	path = tmpdir.join("input.txt")
+	path.write("a\n")
+	cache_dir = tmpdir.join("cache")
+	DecodeCache(str(cache_dir)).load(str(path), decode_plain)
+	assert cache_dir.check()
+
+	processor = CardXMLProcessor()
+	processor.process = lambda: None
+	processor.run([str(path), "--build", "1", "--cache-dir", str(cache_dir), "--clear-cache"])
+	assert not cache_dir.check()
+
+	with pytest.raises(SystemExit):
+		CardXMLProcessor().run([str(path), "--build", "1", "--clear-cache"])